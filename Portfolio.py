@@ -1,5 +1,13 @@
 from reportlab.platypus import Table, TableStyle, Paragraph, Spacer
+import argparse
+import io
+import json
 import os
+import sys
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.colors import HexColor
 from reportlab.lib.styles import ParagraphStyle
@@ -13,19 +21,68 @@ from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.platypus import BaseDocTemplate, PageTemplate, Frame
 from reportlab.lib.utils import ImageReader
 from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.platypus import PageBreak
+from reportlab.pdfgen.canvas import Canvas
+from reportlab import rl_config
+
+from pypdf import PdfReader
+
+from font_cache import load_font
+from image_cache import IMAGE_DPI, ImageRegistry, file_hash, prepare_image
+import image_cache
+from metrics import measure, wrap_lines
+import metrics
+from output_cache import OutputCache
+from pdfstream import StreamingWriter, iter_pages, repack
+from profiles import DEFAULT_PROFILE, PROFILES, get_profile, writer_options
+from render_cache import RecordingCanvas, RenderCache, content_key, replay
+from watch import watch_changes
 
 # ---------- PATHS ----------
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 FONT_DIR = os.path.join(BASE_DIR, "fonts")
 IMG_DIR = os.path.join(BASE_DIR, "images")
 
+OUTPUT_PDF = "Amritha_Portfolio.pdf"
+
+GENERATOR_FILES = [
+    os.path.join(BASE_DIR, name)
+    for name in ("Portfolio.py", "metrics.py", "render_cache.py", "image_cache.py",
+                 "font_cache.py", "pdfstream.py", "profiles.py")
+]
+FONT_FILES = {
+    "Jost": os.path.join(FONT_DIR, "Jost-Regular.ttf"),
+    "Jost-Bold": os.path.join(FONT_DIR, "Jost-Bold.ttf"),
+}
+
+
+def _generator_version():
+    # cached drawing is only valid for the code and fonts that produced it
+    return content_key(*(
+        file_hash(path) for path in GENERATOR_FILES + sorted(FONT_FILES.values())))
+
+
+GENERATOR_VERSION = _generator_version()
+
 # ---------- FONTS ----------
-pdfmetrics.registerFont(
-    TTFont("Jost", os.path.join(FONT_DIR, "Jost-Regular.ttf")))
-pdfmetrics.registerFont(
-    TTFont("Jost-Bold", os.path.join(FONT_DIR, "Jost-Bold.ttf")))
+_fonts_registered = False
+
+
+def register_fonts(reload=False):
+    # TTF parsing is the most expensive part of startup, so do it once per
+    # process and only when something is actually rendered, from a cached
+    # parse when font_cache has one. reload=True re-reads changed font
+    # files and drops everything measured with them.
+    global _fonts_registered, GENERATOR_VERSION
+    if _fonts_registered and not reload:
+        return
+    for name, path in FONT_FILES.items():
+        pdfmetrics.registerFont(load_font(name, path))
+    if reload:
+        metrics.reset()
+        GENERATOR_VERSION = _generator_version()
+    _fonts_registered = True
+
 
 # ---------- COLORS ----------
 PRIMARY = HexColor("#4C5C68")
@@ -38,21 +95,87 @@ BLACK = HexColor("#000000")
 TAG_BG = HexColor("#DDDDDD")
 WHITE_BG = HexColor("#F3F2ED")
 
-# ---------- DOCUMENT ----------
-doc = SimpleDocTemplate(
-    "Amritha_Portfolio.pdf",
-    pagesize=A4,
-    rightMargin=50,
-    leftMargin=50,
-    bottomMargin=50
-)
 
-story = []
+def palette():
+    # the colours as they are now: a theme may change them at runtime, so
+    # cache keys read them at key time rather than import time
+    colors = [PRIMARY, ACCENT, CTA, SOFT_GREEN, CARD_BG, WHITE, BLACK, TAG_BG, WHITE_BG]
+    return [color.hexval() for color in colors]
+
+# Rounded and circular images are embedded already cut to shape instead
+# of clipped at draw time; False brings the clipping paths back (bench.py
+# compares the two)
+PREBAKED_SHAPES = True
 
 # ---------FUNCTIONS---------
 
 
+def image_path(name):
+    # a data file's image name as a path; names are relative to IMG_DIR,
+    # and one that resolves outside it (absolute, "..", a symlink out) is
+    # a ValueError rather than a way to embed any file on the machine
+    path = os.path.join(IMG_DIR, name)
+    root = os.path.realpath(IMG_DIR)
+    if os.path.commonpath([os.path.realpath(path), root]) != root:
+        raise ValueError(f"image {name!r} is outside {IMG_DIR}")
+    return path
+
+
+def _hex(color):
+    return "#" + color.hexval()[2:]
+
+
+def draw_image(canvas, image_path, x, y, width, height, fit="fill",
+               radius=0, background=None, ring=None):
+    # embed a copy resampled to the size it is drawn at instead of the
+    # full-resolution original, shared through the document's registry.
+    # radius, background and ring bake rounded corners into that copy;
+    # see image_cache.prepare_image.
+    if isinstance(canvas, RecordingCanvas):
+        canvas.record_image(image_path, x, y, width, height, fit,
+                            radius, background, ring)
+        canvas = canvas.canv
+    if getattr(canvas, "extents_only", False):
+        # dry runs only need to know where the image goes
+        canvas.drawImage(image_path, x, y, width, height)
+        return
+    doc = getattr(canvas, "_doctemplate", None)
+    dpi = getattr(doc, "image_dpi", IMAGE_DPI)
+    profile = getattr(doc, "profile", None) or get_profile()
+    if isinstance(background, (tuple, list)):
+        background = tuple(_hex(color) for color in background)
+    elif background is not None:
+        background = _hex(background)
+    if ring:
+        ring = (ring[0], _hex(ring[1]))
+    path = prepare_image(image_path, width, height, fit, dpi, profile["jpeg_quality"],
+                         radius=radius, background=background, ring=ring,
+                         lossless=profile["lossless"])
+
+    images = getattr(doc, "images", None)
+    if images is None:
+        canvas.drawImage(ImageReader(path), x, y, width=width,
+                         height=height, mask="auto")
+    else:
+        images.draw(canvas, path, x, y, width, height, source=image_path)
+
+
+def draw_form(canvas, name, draw, *bbox):
+    # Repeated chrome is recorded once per document as a Form XObject and
+    # placed by reference afterwards, so its operators are written once.
+    if not canvas.hasForm(name):
+        canvas.beginForm(name, *bbox)
+        draw(canvas)
+        canvas.endForm()
+    canvas.doForm(name)
+
+
 def draw_header(canvas, doc):
+    draw_form(canvas, "PageHeader", lambda c: _draw_header_chrome(c, doc))
+
+
+def _draw_header_chrome(canvas, doc):
+    data = doc.portfolio
     width, height = A4
     header_height = 50
 
@@ -65,7 +188,7 @@ def draw_header(canvas, doc):
     canvas.setFont("Jost-Bold", 16)
     canvas.setFillColor(PRIMARY)
     # 36 = vertical padding
-    canvas.drawString(50, height - 36, "Amritha P Anil")
+    canvas.drawString(50, height - 36, data["short_name"])
 
     # Right button: Contact Me
     btn_width = 100
@@ -82,14 +205,15 @@ def draw_header(canvas, doc):
     # Button text
     canvas.setFont("Jost-Bold", 16)
     canvas.setFillColor(WHITE)
-    text_width = canvas.stringWidth(
-        "“Design. Iterate. Repeat.”", "Jost-Bold", 12)
+    text_width = canvas.stringWidth(data["tagline"], "Jost-Bold", 12)
     text_x = btn_x + (btn_width - text_width) / 2
     text_y = btn_y + (btn_height - 12) / 2 + 3  # approx vertical centering
-    canvas.drawString(text_x, text_y, "“Design. Iterate. Repeat.”")
+    canvas.drawString(text_x, text_y, data["tagline"])
 
 
-def draw_round_image(canvas, image_path, x, y, size, border_width=4):
+def draw_round_image(canvas, image_path, x, y, size, border_width=4,
+                     background=SOFT_GREEN):
+    # background is what the circle sits on (the banner)
     canvas.saveState()
 
     # Draw white border (slightly bigger circle)
@@ -102,6 +226,14 @@ def draw_round_image(canvas, image_path, x, y, size, border_width=4):
         fill=1
     )
 
+    if PREBAKED_SHAPES:
+        # the image comes already cut to a circle, its corners painted
+        # like the border and banner behind them
+        draw_image(canvas, image_path, x, y, size, size, radius=size / 2,
+                   background=background, ring=(border_width, WHITE))
+        canvas.restoreState()
+        return
+
     # Clip for circular image
     path = canvas.beginPath()
     path.circle(
@@ -112,19 +244,13 @@ def draw_round_image(canvas, image_path, x, y, size, border_width=4):
     canvas.clipPath(path, stroke=0, fill=0)
 
     # Draw the image inside the circle
-    canvas.drawImage(
-        ImageReader(image_path),
-        x,
-        y,
-        width=size,
-        height=size,
-        mask="auto"
-    )
+    draw_image(canvas, image_path, x, y, size, size)
 
     canvas.restoreState()
 
 
 def draw_banner(canvas, doc):
+    data = doc.portfolio
     width, height = A4
     # Green header background (taller)
     canvas.setFillColor(SOFT_GREEN)
@@ -133,7 +259,7 @@ def draw_banner(canvas, doc):
     # Profile image (round)
     draw_round_image(
         canvas,
-        os.path.join(IMG_DIR, "profile.jpg"),
+        image_path(data["profile_image"]),
         x=60,
         y=height - 200,
         size=100
@@ -142,15 +268,11 @@ def draw_banner(canvas, doc):
     # Name
     canvas.setFillColor(PRIMARY)
     canvas.setFont("Jost-Bold", 24)
-    canvas.drawString(190, height - 120, "Amritha Preetha Anil")
+    canvas.drawString(190, height - 120, data["name"])
 
     # Subtitle (INSIDE green box)
     canvas.setFont("Jost", 13)
-    canvas.drawString(
-        190,
-        height - 155,
-        "UX Designer solving complex problems with simple interactions"
-    )
+    canvas.drawString(190, height - 155, data["headline"])
 
 
 def draw_skill_boxes(canvas, skills, x_start, y_start, box_height=30, padding=12, spacing=10, max_width=440):
@@ -161,9 +283,8 @@ def draw_skill_boxes(canvas, skills, x_start, y_start, box_height=30, padding=12
     x = x_start
     y = y_start
 
-    for skill in skills:
-        # calculate width based on text
-        text_width = canvas.stringWidth(skill, "Jost-Bold", 11)
+    # calculate widths based on text
+    for skill, text_width in zip(skills, measure(skills, "Jost-Bold", 11)):
         box_width = text_width + 2 * padding
 
         # wrap to next line if exceeds max_width
@@ -190,13 +311,10 @@ def draw_first_page(canvas, doc):
     # draw_header(canvas, doc)
     draw_banner(canvas, doc)
 
-    skills = ["Research", "UI Design", "Prototyping",
-              "User Testing", "Prototyping Tools"]
-
     # Draw skills below the banner (adjust y_start as needed)
     draw_skill_boxes(
         canvas,
-        skills,
+        doc.portfolio["skills"],
         x_start=70,
         y_start=450,  # distance from bottom of page
         box_height=30,
@@ -234,47 +352,106 @@ later_pages = PageTemplate(
 )
 
 
-title = ParagraphStyle(
-    "Title",
-    fontName="Jost-Bold",
-    fontSize=22,
-    textColor=PRIMARY,
-    spaceAfter=10
-)
-
-subtitle = ParagraphStyle(
-    "Subtitle",
-    fontName="Jost",
-    fontSize=12,
-    textColor=PRIMARY,
-    spaceAfter=20
-)
+_styles = None
+
+
+def get_styles():
+    global _styles
+    if _styles is not None:
+        return _styles
+
+    _styles = {
+        "title": ParagraphStyle(
+            "Title",
+            fontName="Jost-Bold",
+            fontSize=22,
+            textColor=PRIMARY,
+            spaceAfter=10
+        ),
+        "subtitle": ParagraphStyle(
+            "Subtitle",
+            fontName="Jost",
+            fontSize=12,
+            textColor=PRIMARY,
+            spaceAfter=20
+        ),
+        "section": ParagraphStyle(
+            "Section",
+            fontName="Jost-Bold",
+            fontSize=15,
+            textColor=PRIMARY,
+            spaceBefore=20,
+            spaceAfter=12,
+            alignment=1
+        ),
+        "body": ParagraphStyle(
+            "Body",
+            fontName="Jost",
+            fontSize=11,
+            textColor=PRIMARY,
+            leading=16,
+            alignment=1
+        ),
+    }
+    return _styles
 
-section = ParagraphStyle(
-    "Section",
-    fontName="Jost-Bold",
-    fontSize=15,
-    textColor=PRIMARY,
-    spaceBefore=20,
-    spaceAfter=12,
-    alignment=1
-)
 
-body = ParagraphStyle(
-    "Body",
-    fontName="Jost",
-    fontSize=11,
-    textColor=PRIMARY,
-    leading=16,
-    alignment=1
-)
 # ---------CLASSES---------
 
 PAGE_WIDTH, PAGE_HEIGHT = A4
 
 
-class CertificateCards(Flowable):
-    def __init__(self, certificates, width=100, box_height=60, spacing=15, left_padding=12):
+class CachedFlowable(Flowable):
+    # Drawing is recorded under a hash of the flowable's public attributes
+    # and replayed on later builds, so an edit only re-runs the flowables
+    # whose inputs changed.
+    def cache_inputs(self):
+        return {
+            k: v for k, v in vars(self).items()
+            if not k.startswith("_") and k not in ("canv", "drawOn")
+        }
+
+    def cache_key(self):
+        # image shapes are settings, not inputs: PREBAKED_SHAPES decides
+        # between a clip path and a pre-cut copy in the recording itself
+        shapes = (PREBAKED_SHAPES, image_cache.MASK_SUPERSAMPLE)
+        return content_key(type(self).__name__, GENERATOR_VERSION, shapes, palette(),
+                           self.cache_inputs())
+
+    def drawAt(self, x, y, canvas):
+        # grid cells draw in their own translated space so the recording
+        # doesn't depend on where the cell lands
+        canvas.saveState()
+        canvas.translate(x, y)
+        self._x = self._y = 0
+        self._drawOn(canvas)
+        canvas.restoreState()
+
+    def _drawOn(self, canv):
+        cache = getattr(getattr(canv, "_doctemplate", None), "render_cache", None)
+        if cache is None:
+            return super()._drawOn(canv)
+
+        key = self.cache_key()
+        ops = cache.get(key)
+        if ops is not None:
+            replay(canv, ops, draw_image)
+            return
+
+        recorder = RecordingCanvas(canv)
+        super()._drawOn(recorder)
+        if recorder.unrecorded is None:
+            cache.put(key, recorder.ops)
+        else:
+            # replaying would leave that call out; draw it every time
+            cache.uncacheable[type(self).__name__] = recorder.unrecorded
+
+
+class CertificateCards(CachedFlowable):
+    # A view of certificates[start:stop]; splitting hands out views of the
+    # same list instead of copies.
+    def __init__(self, certificates, width=100, box_height=60, spacing=15, left_padding=12,
+                 start=0, stop=None):
 
         super().__init__()
         self.certificates = certificates
@@ -282,14 +459,36 @@ class CertificateCards(Flowable):
         self.box_height = box_height
         self.spacing = spacing
         self.left_padding = left_padding
-        self.height = len(certificates) * (box_height + spacing)
+        self.start = start
+        self.stop = len(certificates) if stop is None else stop
+        self.height = (self.stop - self.start) * (box_height + spacing)
+
+    def cache_inputs(self):
+        # only the certificates this view draws
+        inputs = super().cache_inputs()
+        inputs["certificates"] = self.certificates[self.start:self.stop]
+        return inputs
+
+    def split(self, availWidth, availHeight):
+        fits = int(availHeight // (self.box_height + self.spacing))
+        if fits <= 0:
+            return []
+        if self.start + fits >= self.stop:
+            return [self]
+        middle = self.start + fits
+        return [self._view(self.start, middle), self._view(middle, self.stop)]
+
+    def _view(self, start, stop):
+        return CertificateCards(self.certificates, self.width, self.box_height,
+                                self.spacing, self.left_padding, start, stop)
 
     def draw(self):
         c = self.canv
         y_start = 0
         x_start = ((PAGE_WIDTH - self.width) / 2) - 52  # center horizontally
         c.saveState()
-        for cert in self.certificates:
+        for index in range(self.start, self.stop):
+            cert = self.certificates[index]
             if len(cert) == 4:
                 title_text, subtitle_text, color_hex, url = cert
             else:
@@ -336,7 +535,7 @@ class CertificateCards(Flowable):
         c.restoreState()
 
 
-class ProjectCard(Flowable):
+class ProjectCard(CachedFlowable):
     def __init__(
         self,
         title,
@@ -357,19 +556,43 @@ class ProjectCard(Flowable):
         self.learned = learned
         self.icon = icon
         self.width = width
-        self.height = height
         self.padding = padding
-
-    def drawAt(self, x, y, canvas):
-        self.canv = canvas
-        self._x = x
-        self._y = y
-        self.draw()
+        self._wrapped = None
+        # height is the least the card takes; long text makes it taller
+        self.height = max(height, self._content_height())
+
+    def _lines(self):
+        # description and learned text wrapped once per card, and the tags
+        # broken into rows that fit, for measuring and drawing alike
+        if self._wrapped is None:
+            max_width = self.width - 2 * self.padding
+            tag_rows = [[]]
+            row_width = 0
+            for tag, tag_width in zip(self.tags, measure(self.tags, "Jost", 8.5)):
+                w = tag_width + 10
+                if tag_rows[-1] and row_width + w > max_width:
+                    tag_rows.append([])
+                    row_width = 0
+                tag_rows[-1].append((tag, w))
+                row_width += w + 5
+            self._wrapped = (self._wrap(self.description, None, 9.5),
+                             tag_rows,
+                             self._wrap(self.learned, None, 9.5))
+        return self._wrapped
+
+    def _content_height(self):
+        # what draw() uses top to bottom: title, subtitle and spacing around
+        # the two texts and the first tag row, 13pt per text line, 18pt per
+        # further tag row and a descent
+        description, tag_rows, learned = self._lines()
+        return (2 * self.padding + 86 + 13 * (len(description) + len(learned))
+                + 18 * (len(tag_rows) - 1))
 
     def draw(self):
         c = self.canv
         x = self._x
         y = self._y
+        description, tag_rows, learned = self._lines()
 
         c.saveState()
 
@@ -395,21 +618,23 @@ class ProjectCard(Flowable):
         c.setFont("Jost", 9.5)
         text = c.beginText(text_x, cursor_y)
         text.setLeading(13)
-        for line in self._wrap(self.description, c, 9.5):
+        for line in description:
             text.textLine(line)
         c.drawText(text)
         cursor_y = text.getY() - 10
 
         # Tags
-        tag_x = text_x
         c.setFont("Jost", 8.5)
-        for tag in self.tags:
-            w = c.stringWidth(tag, "Jost", 8.5) + 10
-            c.setFillColor(TAG_BG)
-            c.roundRect(tag_x, cursor_y - 12, w, 14, 6, fill=1, stroke=0)
-            c.setFillColor(BLACK)
-            c.drawCentredString(tag_x + w / 2, cursor_y - 7, tag)
-            tag_x += w + 5
+        for row, tags in enumerate(tag_rows):
+            if row:
+                cursor_y -= 18
+            tag_x = text_x
+            for tag, w in tags:
+                c.setFillColor(TAG_BG)
+                c.roundRect(tag_x, cursor_y - 12, w, 14, 6, fill=1, stroke=0)
+                c.setFillColor(BLACK)
+                c.drawCentredString(tag_x + w / 2, cursor_y - 7, tag)
+                tag_x += w + 5
 
         cursor_y -= 22
 
@@ -423,25 +648,14 @@ class ProjectCard(Flowable):
         c.setFont("Jost", 9.5)
         text = c.beginText(text_x, cursor_y - 8)
         text.setLeading(13)
-        for line in self._wrap(self.learned, c, 9.5):
+        for line in learned:
             text.textLine(line)
         c.drawText(text)
 
         c.restoreState()
 
     def _wrap(self, text, canvas, size):
-        max_width = self.width - 2 * self.padding
-        words, line, lines = text.split(), "", []
-        for w in words:
-            test = line + w + " "
-            if canvas.stringWidth(test, "Jost", size) <= max_width:
-                line = test
-            else:
-                lines.append(line)
-                line = w + " "
-        if line:
-            lines.append(line)
-        return lines
+        return wrap_lines(text, "Jost", size, self.width - 2 * self.padding)
 
 
 class CopyrightCard(Flowable):
@@ -460,8 +674,13 @@ class CopyrightCard(Flowable):
         return self.width, self.height
 
     def draw(self):
-        c = self.canv
+        # the bar reaches past the frame, so the form's bbox has to as well
+        name = "Copyright-%x" % zlib.crc32(
+            repr((self.width, self.height, self.text)).encode("utf8"))
+        draw_form(self.canv, name, self._draw_bar,
+                  -80, -60, self.width + 70, self.height)
 
+    def _draw_bar(self, c):
         # Background bar
         c.setFillColor(SOFT_GREEN)
         c.rect(
@@ -484,7 +703,7 @@ class CopyrightCard(Flowable):
         c.drawString(text_x, text_y, self.text)
 
 
-class ImageCard(Flowable):
+class ImageCard(CachedFlowable):
     def __init__(
         self,
         image_path,
@@ -504,12 +723,6 @@ class ImageCard(Flowable):
         self.radius = radius
         self.border = border
 
-    def drawAt(self, x, y, canvas):
-        self.canv = canvas
-        self._x = x
-        self._y = y
-        self.draw()
-
     def draw(self):
         c = self.canv
         x, y = self._x, self._y
@@ -528,23 +741,30 @@ class ImageCard(Flowable):
             stroke=0
         )
 
-        # Clip image
-        path = c.beginPath()
-        path.roundRect(x, y, self.width, self.height, self.radius)
-        c.clipPath(path, stroke=0, fill=0)
-
-        c.drawImage(
-            ImageReader(self.image_path),
-            x, y,
-            width=self.width,
-            height=self.height,
-            mask="auto"
-        )
-
-        # Caption overlay
         caption_height = 28
-        c.setFillColor(WHITE_BG)
-        c.rect(x, y, self.width, caption_height, fill=1, stroke=0)
+        if PREBAKED_SHAPES:
+            # corners come rounded over the white border
+            draw_image(c, self.image_path, x, y, self.width, self.height,
+                       radius=self.radius, background=WHITE)
+
+            # Caption overlay, its bottom corners rounded like the image's;
+            # half a point wider so the image's edge doesn't show around it
+            c.setFillColor(WHITE_BG)
+            c.roundRect(x - 0.5, y - 0.5, self.width + 1, caption_height + 0.5,
+                        self.radius + 0.5, fill=1, stroke=0)
+            c.rect(x, y + self.radius, self.width, caption_height - self.radius,
+                   fill=1, stroke=0)
+        else:
+            # Clip image
+            path = c.beginPath()
+            path.roundRect(x, y, self.width, self.height, self.radius)
+            c.clipPath(path, stroke=0, fill=0)
+
+            draw_image(c, self.image_path, x, y, self.width, self.height)
+
+            # Caption overlay
+            c.setFillColor(WHITE_BG)
+            c.rect(x, y, self.width, caption_height, fill=1, stroke=0)
 
         c.setFont("Jost-Bold", 9)
         c.setFillColor(HexColor("#8b9a7a"))
@@ -565,49 +785,112 @@ class ImageCard(Flowable):
         c.restoreState()
 
 
-class TwoColumnGrid(Flowable):
-    def __init__(self, items, spacing=30):
+class _GridItems:
+    # What every part of a split grid shares: the items and their sizes,
+    # each measured once with item.wrap the first time a layout needs it.
+    def __init__(self, items):
+        self.items = items
+        self._sizes = [None] * len(items)
+        self.col_width = max((item.width for item in items), default=0)
+
+    def size(self, index):
+        size = self._sizes[index]
+        if size is None:
+            size = self._sizes[index] = self.items[index].wrap(self.col_width, PAGE_HEIGHT)
+        return size
+
+
+class Grid(Flowable):
+    # Cards in `cols` columns. Rows are as tall as their tallest card; with
+    # masonry each card goes under the shortest column instead. A grid is a
+    # view of items [start, stop): splitting hands out views sharing the
+    # measured sizes, and a layout only ever looks at the cards that fit on
+    # the page, so paging through n cards costs O(n) in all.
+    def __init__(self, items, cols=2, spacing=30, masonry=False,
+                 start=0, stop=None, _shared=None):
         super().__init__()
         self.items = items
+        self.cols = cols
         self.spacing = spacing
-        self.cols = 2
-
-        self.item_width = items[0].width
-        self.item_height = items[0].height
+        self.masonry = masonry
+        self.start = start
+        self.stop = len(items) if stop is None else stop
+
+        self._shared = _shared or _GridItems(items)
+        self.item_width = self._shared.col_width
+        self._layout = None
+
+    def _view(self, start, stop):
+        view = Grid.__new__(type(self))
+        Grid.__init__(view, self.items, self.cols, self.spacing, self.masonry,
+                      start, stop, self._shared)
+        return view
+
+    def _pack(self, avail_height):
+        # Places cards from start on until one doesn't fit in avail_height.
+        # Returns (stop, height, [(index, col, top offset)]); height is more
+        # than avail_height when not every card fit.
+        shared = self._shared
+        spacing = self.spacing
+        placed = []
+        if self.masonry:
+            columns = [0] * self.cols
+            for index in range(self.start, self.stop):
+                col = columns.index(min(columns))
+                bottom = columns[col] + shared.size(index)[1] + spacing
+                if bottom > avail_height:
+                    return index, bottom, placed
+                placed.append((index, col, columns[col]))
+                columns[col] = bottom
+            return self.stop, max(columns), placed
+
+        top = 0
+        for first in range(self.start, self.stop, self.cols):
+            last = min(first + self.cols, self.stop)
+            bottom = top + max(shared.size(i)[1] for i in range(first, last)) + spacing
+            if bottom > avail_height:
+                return first, bottom, placed
+            placed.extend((i, i - first, top) for i in range(first, last))
+            top = bottom
+        return self.stop, top, placed
+
+    def _layout_for(self, avail_height):
+        if self._layout is None or self._layout[0] != avail_height:
+            self._layout = (avail_height, self._pack(avail_height))
+        return self._layout[1]
 
     def wrap(self, availWidth, availHeight):
-        rows = (len(self.items) + 1) // 2
+        _, height, _ = self._layout_for(availHeight)
         self.width = availWidth
-        self.height = rows * (self.item_height + self.spacing)
+        self.height = height
         return self.width, self.height
 
     def split(self, availWidth, availHeight):
-        rows_fit = int(availHeight // (self.item_height + self.spacing))
-        if rows_fit <= 0:
+        stop, _, _ = self._layout_for(availHeight)
+        if stop <= self.start:
             return []
-
-        max_items = rows_fit * 2
-        return [
-            TwoColumnGrid(self.items[:max_items], self.spacing),
-            TwoColumnGrid(self.items[max_items:], self.spacing)
-        ] if len(self.items) > max_items else []
+        if stop >= self.stop:
+            return [self]
+        return [self._view(self.start, stop), self._view(stop, self.stop)]
 
     def draw(self):
         c = self.canv
-        total_width = self.item_width * 2 + self.spacing
+        _, _, placed = self._layout_for(self._layout[0])
+        total_width = self.item_width * self.cols + self.spacing * (self.cols - 1)
         x_start = (self.width - total_width) / 2
-        y = self.height - self.item_height
-
-        for i, item in enumerate(self.items):
-            col = i % 2
-            if col == 0 and i != 0:
-                y -= self.item_height + self.spacing
 
+        for index, col, top in placed:
+            item = self.items[index]
             x = x_start + col * (self.item_width + self.spacing)
-            item.drawAt(x, y, c)
+            item.drawAt(x, self.height - top - self._shared.size(index)[1], c)
+
 
+class TwoColumnGrid(Grid):
+    def __init__(self, items, spacing=30, masonry=False, start=0, stop=None, _shared=None):
+        super().__init__(items, 2, spacing, masonry, start, stop, _shared)
 
-class LetsConnectCard(Flowable):
+
+class LetsConnectCard(CachedFlowable):
     def __init__(
         self,
         email="amrithapanil0326@gmail.com",
@@ -623,11 +906,7 @@ class LetsConnectCard(Flowable):
         self.card_width = card_width
         self.card_height = card_height
 
-        self.links = links or [
-            ("LinkedIn", "https://www.linkedin.com/in/amritha-p-8anil89700/"),
-            ("Behance", "https://www.behance.net/amrithaanil"),
-            ("GitHub", "https://github.com/Amritha-0326"),
-        ]
+        self.links = links or DEFAULT_DATA["contact"]["links"]
 
         # This Flowable only occupies vertical space equal to its content
         self.width = A4[0]
@@ -650,8 +929,8 @@ class LetsConnectCard(Flowable):
         box_data = []
         total_width = 0
 
-        for label, url in self.links:
-            text_width = c.stringWidth(label, "Jost-Bold", 11)
+        labels = [label for label, _ in self.links]
+        for (label, url), text_width in zip(self.links, measure(labels, "Jost-Bold", 11)):
             box_width = text_width + padding_x * 2
             box_data.append((label, url, box_width))
             total_width += box_width
@@ -750,9 +1029,11 @@ class LetsConnectCard(Flowable):
         self._draw_social_boxes(c, center_x, container_y)
 
 
-class PersonalPassion(Flowable):
+class PersonalPassion(CachedFlowable):
     def __init__(
         self,
+        cards=None,
+        footer_text=None,
         width=A4[0] - 100,
         card_width=160,
         card_height=260,
@@ -767,62 +1048,17 @@ class PersonalPassion(Flowable):
         self.height = card_height + 160  # total vertical space
 
         self.cards = [
-            {
-                "title": "Weekend Sketches",
-                "text": (
-                    "Sketching helps me see. It sharpens my eye for detail and keeps "
-                    "my creative instincts grounded, just like good design should."
-                ),
-                "image": os.path.join(IMG_DIR, "passion-image.jpg"),
-            },
-            {
-                "title": "Scent & Sensibility",
-                "text": (
-                    "I’m drawn to the layers, balance, and emotion behind a well-crafted "
-                    "fragrance. It is storytelling through subtle detail."
-                ),
-                "image": os.path.join(IMG_DIR, "scent.png"),
-            },
-            {
-                "title": "Matcha Rituals",
-                "text": (
-                    "The quiet ritual of making matcha reminds me to slow down, "
-                    "stay present, and design with intention."
-                ),
-                "image": os.path.join(IMG_DIR, "matcha.png"),
-            },
+            dict(card, image=image_path(card["image"]))
+            for card in (cards or DEFAULT_DATA["passions"])
         ]
+        self.footer_text = footer_text or DEFAULT_DATA["passion_footer"]
 
     def wrap(self, availWidth, availHeight):
         return availWidth, self.height
 
-    def _draw_cover_image(self, c, image_path, x, y, box_w, box_h):
-        img = ImageReader(image_path)
-        img_w, img_h = img.getSize()
-
-        img_ratio = img_w / img_h
-        box_ratio = box_w / box_h
-
-        if img_ratio > box_ratio:
-            # image is wider → crop sides
-            draw_h = box_h
-            draw_w = box_h * img_ratio
-        else:
-            # image is taller → crop top/bottom
-            draw_w = box_w
-            draw_h = box_w / img_ratio
-
-        draw_x = x - (draw_w - box_w) / 2
-        draw_y = y - (draw_h - box_h) / 2
-
-        c.drawImage(
-            img,
-            draw_x,
-            draw_y,
-            width=draw_w,
-            height=draw_h,
-            mask="auto"
-        )
+    def _draw_cover_image(self, c, image_path, x, y, box_w, box_h, **rounded):
+        # the cached copy is already cropped to the box's aspect ratio
+        draw_image(c, image_path, x, y, box_w, box_h, fit="cover", **rounded)
 
     def draw(self):
         c = self.canv
@@ -854,29 +1090,14 @@ class PersonalPassion(Flowable):
             )
 
         # ---------- Footer Text ----------
-        footer_text = (
-            "My work is shaped by more than just tools and techniques – it’s shaped by "
-            "the things I care about. Whether it’s sketching on the weekends or getting "
-            "lost in the quiet details of everyday life, the more grounded I am outside "
-            "the screen, the more empathy and clarity I bring into my designs."
-        )
+        footer_text = self.footer_text
         x_gap = 10
         text = c.beginText(x_gap, y_card - 60)
         text.setFont("Jost", 11)
         text.setFillColor(PRIMARY)
         text.setLeading(16)
 
-        max_width = page_width - 120
-        words, line = footer_text.split(), ""
-
-        for word in words:
-            test = line + word + " "
-            if c.stringWidth(test, "Jost", 11) <= max_width:
-                line = test
-            else:
-                text.textLine(line)
-                line = word + " "
-        if line:
+        for line in wrap_lines(footer_text, "Jost", 11, page_width - 120):
             text.textLine(line)
 
         c.drawText(text)
@@ -898,27 +1119,40 @@ class PersonalPassion(Flowable):
 
         # ---------- Image (CLIPPED) ----------
         img_height = 170
-        c.saveState()  # 🔑 isolate clipping
+        if PREBAKED_SHAPES:
+            # top corners lie over the page, bottom ones over the card
+            self._draw_cover_image(
+                c,
+                image_path,
+                x,
+                y + self.card_height - img_height,
+                self.card_width,
+                img_height,
+                radius=14,
+                background=(WHITE, CARD_BG),
+            )
+        else:
+            c.saveState()  # 🔑 isolate clipping
 
-        path = c.beginPath()
-        path.roundRect(
-            x,
-            y + self.card_height - img_height,
-            self.card_width,
-            img_height,
-            14
-        )
-        c.clipPath(path, stroke=0, fill=0)
+            path = c.beginPath()
+            path.roundRect(
+                x,
+                y + self.card_height - img_height,
+                self.card_width,
+                img_height,
+                14
+            )
+            c.clipPath(path, stroke=0, fill=0)
 
-        self._draw_cover_image(
-            c,
-            image_path,
-            x,
-            y + self.card_height - img_height,
-            self.card_width,
-            img_height
-        )
-        c.restoreState()  # 🔑 clipping ends here
+            self._draw_cover_image(
+                c,
+                image_path,
+                x,
+                y + self.card_height - img_height,
+                self.card_width,
+                img_height
+            )
+            c.restoreState()  # 🔑 clipping ends here
 
         # ---------- Text ----------
         text_x = x + 14
@@ -938,123 +1172,492 @@ class PersonalPassion(Flowable):
         text_obj = c.beginText(text_x, cursor_y)
         text_obj.setLeading(14)
 
-        max_width = self.card_width - 28
-        words, line = text.split(), ""
-
-        for word in words:
-            test = line + word + " "
-            if c.stringWidth(test, "Jost", 9.8) <= max_width:
-                line = test
-            else:
-                text_obj.textLine(line)
-                line = word + " "
-        if line:
+        for line in wrap_lines(text, "Jost", 9.8, self.card_width - 28):
             text_obj.textLine(line)
 
         c.drawText(text_obj)
         c.restoreState()
 
 
-# ---------- OVERVIEW ----------
-story.append(Spacer(1, 185))
-story.append(Paragraph("Professional Overview", section))
-story.append(
-    Paragraph(
+# ---------- DATA ----------
+DEFAULT_DATA = {
+    "name": "Amritha Preetha Anil",
+    "short_name": "Amritha P Anil",
+    "tagline": "“Design. Iterate. Repeat.”",
+    "headline": "UX Designer solving complex problems with simple interactions",
+    # image paths are relative to IMG_DIR
+    "profile_image": "profile.jpg",
+    "skills": ["Research", "UI Design", "Prototyping",
+               "User Testing", "Prototyping Tools"],
+    "overview": (
         "I’m just starting out as a UX designer, but I’m already passionate about turning "
         "user needs into intuitive, meaningful experiences. I bring curiosity, attention "
-        "to detail, and a research-driven mindset to every project.",
-        body
-    )
-)
-story.append(Spacer(1, 80))
-
-# ---------- CERTIFICATES DATA ----------
-certificates = [
-    ("UX Research & Early Testing", "Google Career Certificate · 2025",
-     "#4c5c68", "https://coursera.org/verify/NM7EE4NTFUQG"),
-    ("UX Design Process", "Google Career Certificate · 2023", "#b87b5a",
-     "https://coursera.org/verify/HVDVFMEQLPZK"),
-    ("Foundations of UX Design", "Google Career Certificate · 2021",
-     "#8b9a7a", "https://coursera.org/verify/8G87LVSUC5CC")
-]
-certificates1 = [
-    ("React Basics", "Meta · In Progress", "#8b9a7a"),
-    ("Unit Testing in React.js", "Coursera · 2025", "#cbbfb0",
-     "https://coursera.org/share/489f522143b954e11686213c8728e81f")
-]
-
-story.append(Paragraph(
-    "Certificates & Achievements",
-    ParagraphStyle(
-        "Section", fontName="Jost-Bold", fontSize=15, textColor=HexColor("#4C5C68"),
-        spaceBefore=20, spaceAfter=12, alignment=1
-    )
-))
-story.append(Spacer(0, 10))
-
-story.append(CertificateCards(
-    certificates, width=200, box_height=80, spacing=15))
-story.append(Spacer(0, 10))
-story.append(CertificateCards(
-    certificates1, width=200, box_height=80, spacing=15))
-story.append(Spacer(0, 10))
-story.append(PersonalPassion())
-
-# ---------- PROJECTS ----------
-story.append(Spacer(1, 10))
-story.append(Paragraph("Fun Projects & Learning", section))
-story.append(Spacer(1, 30))
-
-project_cards = [
-    ProjectCard(
-        title="Aesthetic Egg Timer",
-        subtitle="Desktop UI Experiment · React + Electron",
-        description="A retro pixel-art style egg timer with three preset options, soft, runny, and hard. Built with React for the timer logic and UI, then packaged using Electron to run as a lightweight desktop application with a playful, nostalgic aesthetic.",
-        tags=["React", "Electron", "UI Design", "Desktop App", "Pixel Art"],
-        learned="How to combine React logic with Electron to create a desktop app, structure timer-based state effectively, and design a clear, fun interface without overcomplicating functionality.",
-        icon="🥚"
+        "to detail, and a research-driven mindset to every project."
     ),
-    ProjectCard(
-        title="Aesthetic Weather App",
-        subtitle="API-Based Frontend Project",
-        description="Created an aesthetic weather application inspired by the Egg Timer’s visual style. The app fetches real-time weather data from the OpenWeatherMap API and supports city-based search, a custom color palette, and clear loading and error states.",
-        tags=["API Integration", "Frontend", "UI Design", "Async States"],
-        learned="Working with real-time data requires thoughtful handling of loading and error states. Consistent visual design helps make technical features feel friendly and approachable.",
-        icon="☁️"
-    )
-]
-
-story.append(TwoColumnGrid(project_cards))
-story.append(Spacer(1, 40))
-
-image_cards = [
-    ImageCard(
-        os.path.join(IMG_DIR, "project1.jpg"),
-        caption="Aesthetic Egg Timer",
-        link="https://github.com/Amritha-0326/Aesthetic-Egg-Timer"
+    # each group is drawn as its own CertificateCards block
+    "certificates": [
+        [
+            ("UX Research & Early Testing", "Google Career Certificate · 2025",
+             "#4c5c68", "https://coursera.org/verify/NM7EE4NTFUQG"),
+            ("UX Design Process", "Google Career Certificate · 2023", "#b87b5a",
+             "https://coursera.org/verify/HVDVFMEQLPZK"),
+            ("Foundations of UX Design", "Google Career Certificate · 2021",
+             "#8b9a7a", "https://coursera.org/verify/8G87LVSUC5CC")
+        ],
+        [
+            ("React Basics", "Meta · In Progress", "#8b9a7a"),
+            ("Unit Testing in React.js", "Coursera · 2025", "#cbbfb0",
+             "https://coursera.org/share/489f522143b954e11686213c8728e81f")
+        ],
+    ],
+    "projects": [
+        {
+            "title": "Aesthetic Egg Timer",
+            "subtitle": "Desktop UI Experiment · React + Electron",
+            "description": "A retro pixel-art style egg timer with three preset options, soft, runny, and hard. Built with React for the timer logic and UI, then packaged using Electron to run as a lightweight desktop application with a playful, nostalgic aesthetic.",
+            "tags": ["React", "Electron", "UI Design", "Desktop App", "Pixel Art"],
+            "learned": "How to combine React logic with Electron to create a desktop app, structure timer-based state effectively, and design a clear, fun interface without overcomplicating functionality.",
+            "icon": "🥚",
+        },
+        {
+            "title": "Aesthetic Weather App",
+            "subtitle": "API-Based Frontend Project",
+            "description": "Created an aesthetic weather application inspired by the Egg Timer’s visual style. The app fetches real-time weather data from the OpenWeatherMap API and supports city-based search, a custom color palette, and clear loading and error states.",
+            "tags": ["API Integration", "Frontend", "UI Design", "Async States"],
+            "learned": "Working with real-time data requires thoughtful handling of loading and error states. Consistent visual design helps make technical features feel friendly and approachable.",
+            "icon": "☁️",
+        },
+    ],
+    "image_cards": [
+        {
+            "image": "project1.jpg",
+            "caption": "Aesthetic Egg Timer",
+            "link": "https://github.com/Amritha-0326/Aesthetic-Egg-Timer",
+        },
+        {
+            "image": "project2.jpg",
+            "caption": "Aesthetic Weather App",
+            "link": "https://github.com/Amritha-0326/Aesthetic-Weather-App",
+        },
+    ],
+    "passions": [
+        {
+            "title": "Weekend Sketches",
+            "text": (
+                "Sketching helps me see. It sharpens my eye for detail and keeps "
+                "my creative instincts grounded, just like good design should."
+            ),
+            "image": "passion-image.jpg",
+        },
+        {
+            "title": "Scent & Sensibility",
+            "text": (
+                "I’m drawn to the layers, balance, and emotion behind a well-crafted "
+                "fragrance. It is storytelling through subtle detail."
+            ),
+            "image": "scent.png",
+        },
+        {
+            "title": "Matcha Rituals",
+            "text": (
+                "The quiet ritual of making matcha reminds me to slow down, "
+                "stay present, and design with intention."
+            ),
+            "image": "matcha.png",
+        },
+    ],
+    "passion_footer": (
+        "My work is shaped by more than just tools and techniques – it’s shaped by "
+        "the things I care about. Whether it’s sketching on the weekends or getting "
+        "lost in the quiet details of everyday life, the more grounded I am outside "
+        "the screen, the more empathy and clarity I bring into my designs."
     ),
-    ImageCard(
-        os.path.join(IMG_DIR, "project2.jpg"),
-        caption="Aesthetic Weather App",
-        link="https://github.com/Amritha-0326/Aesthetic-Weather-App"
-    ),
-]
-
-story.append(TwoColumnGrid(image_cards))
-# story.append(Spacer(1, 20))
-# story.append(PersonalPassion())
-story.append(Spacer(1, 60))
-story.append(PageBreak())
-story.append(LetsConnectCard())
-story.append(Spacer(-10, 300))  # optional breathing space
-story.append(CopyrightCard())
+    "contact": {
+        "email": "amrithapanil0326@gmail.com",
+        "location": "Germany",
+        "links": [
+            ("LinkedIn", "https://www.linkedin.com/in/amritha-p-8anil89700/"),
+            ("Behance", "https://www.behance.net/amrithaanil"),
+            ("GitHub", "https://github.com/Amritha-0326"),
+        ],
+    },
+    "copyright": "© 2025 Amritha Preetha Anil. All rights reserved.",
+    # project and image card grids; masonry stacks cards under the shortest
+    # column instead of lining them up in rows
+    "grid": {"columns": 2, "masonry": False},
+}
+
+
+# ---------- STORY ----------
+def _column_width(total, cols, spacing=30):
+    return (total - spacing * (cols - 1)) / cols
+
+
+def build_story(data):
+    styles = get_styles()
+    section = styles["section"]
+    story = []
+
+    # ---------- OVERVIEW ----------
+    story.append(Spacer(1, 185))
+    story.append(Paragraph("Professional Overview", section))
+    story.append(Paragraph(data["overview"], styles["body"]))
+    story.append(Spacer(1, 80))
+
+    # ---------- CERTIFICATES ----------
+    story.append(Paragraph("Certificates & Achievements", section))
+    story.append(Spacer(0, 10))
+
+    for certificates in data["certificates"]:
+        story.append(CertificateCards(
+            certificates, width=200, box_height=80, spacing=15))
+        story.append(Spacer(0, 10))
+    story.append(PersonalPassion(data["passions"], data["passion_footer"]))
+
+    # ---------- PROJECTS ----------
+    story.append(Spacer(1, 10))
+    story.append(Paragraph("Fun Projects & Learning", section))
+    story.append(Spacer(1, 30))
+
+    grid = data["grid"]
+    cols = grid.get("columns", 2)
+    masonry = grid.get("masonry", False)
+
+    # cards shrink to share the width two columns of them have always had
+    project_cards = [
+        ProjectCard(**dict({"width": _column_width(570, cols)}, **project))
+        for project in data["projects"]
+    ]
+    if project_cards:
+        story.append(Grid(project_cards, cols, masonry=masonry))
+    story.append(Spacer(1, 40))
+
+    image_cards = [
+        ImageCard(
+            image_path(card["image"]),
+            caption=card["caption"],
+            link=card.get("link"),
+            width=_column_width(430, cols),
+        )
+        for card in data["image_cards"]
+    ]
+    if image_cards:
+        story.append(Grid(image_cards, cols, masonry=masonry))
+    story.append(Spacer(1, 60))
+    story.append(PageBreak())
+    story.append(LetsConnectCard(**data["contact"]))
+    story.append(Spacer(-10, 300))  # optional breathing space
+    story.append(CopyrightCard(data["copyright"]))
+    return story
 
 
 # ---------- BUILD ----------
-doc.build(
-    story,
-    onFirstPage=draw_first_page,  # header + banner
-    onLaterPages=draw_header       # only compact header
-)
+_render_cache = None
+# ReportLab has no per-canvas ASCII85 setting: it reads the process-wide
+# rl_config.useA85 as it embeds images and writes streams. Builds take
+# turns under this lock, so two threads building with different profiles
+# never encode each other's streams; parallel builds use processes.
+_a85_lock = threading.Lock()
+
+# below this many pages a parallel build isn't worth starting workers for
+PARALLEL_MIN_PAGES = 40
+
+
+class PortfolioDocTemplate(SimpleDocTemplate):
+    # Keeps where each story flowable was placed, as (page, x, y, width,
+    # height, flowable) with the box it was wrapped to, and draws only the
+    # pages in draw_pages (all of them when None). Layout runs the same whatever is drawn, so a build
+    # that draws a few pages gets them exactly as a full build would.
+    def __init__(self, *args, draw_pages=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.draw_pages = draw_pages
+        self.placements = []
+
+    def drawing(self):
+        return self.draw_pages is None or self.page in self.draw_pages
+
+    def handle_frameBegin(self, *args, **kwargs):
+        super().handle_frameBegin(*args, **kwargs)
+        # every flowable reaches the page through frame.add, including the
+        # first part of a split, which never passes handle_flowable
+        frame = self.frame
+        frame.add = lambda flowable, canv, trySplit=0: self._add(
+            frame, flowable, canv, trySplit)
+
+    def _add(self, frame, flowable, canv, trySplit):
+        draw_on = type(flowable).drawOn
+
+        def place(canv, x, y, _sW=0):
+            self.placements.append((
+                self.page, flowable._hAlignAdjust(x, _sW), y,
+                frame._getAvailableWidth() - _sW, getattr(flowable, "height", 0),
+                flowable))
+            if self.drawing():
+                draw_on(flowable, canv, x, y, _sW)
+        flowable.drawOn = place
+        return Frame.add(frame, flowable, canv, trySplit)
+
+
+def _on_page(draw):
+    def on_page(canvas, doc):
+        if doc.drawing():
+            draw(canvas, doc)
+    return on_page
+
+
+def build_portfolio(data=None, output=OUTPUT_PDF, image_dpi=None,
+                    images=None, render_cache=None, draw_pages=None,
+                    canvasmaker=Canvas, profile=DEFAULT_PROFILE):
+    # output may be a filename or a writable file object; keys missing from
+    # data fall back to DEFAULT_DATA. profile names the output profile (see
+    # profiles.py); images are embedded at its resolution unless image_dpi
+    # says otherwise. Pass an ImageRegistry as images to read its
+    # decode/embed counters afterwards.
+    # Flowable drawing is reused through render_cache, by default one
+    # RenderCache shared by every build in the process; False turns it off.
+    # Pages not in draw_pages are left blank. Returns the doc template.
+    global _render_cache
+    register_fonts()
+    data = dict(DEFAULT_DATA, **(data or {}))
+    settings = get_profile(profile)
+    # ReportLab can't write object streams: the finished PDF is repacked.
+    # A partial build is only ever stitched into one, which does that.
+    repacked = settings["object_streams"] and draw_pages is None
+
+    # files are built in memory and swapped in whole, so a viewer that has
+    # the PDF open never reads a half-written file
+    target = io.BytesIO() if isinstance(output, str) or repacked else output
+    doc = PortfolioDocTemplate(
+        target,
+        pagesize=A4,
+        rightMargin=50,
+        leftMargin=50,
+        bottomMargin=50,
+        draw_pages=draw_pages,
+        # fixed dates and document ID: the same inputs give the same bytes
+        invariant=True,
+        pageCompression=int(settings["compress"]),
+    )
+    # page callbacks (draw_header, draw_banner) read their text from here
+    doc.portfolio = data
+    doc.profile = settings
+    doc.image_dpi = image_dpi or settings["image_dpi"]
+    doc.images = images if images is not None else ImageRegistry()
+    if render_cache is None:
+        if _render_cache is None:
+            _render_cache = RenderCache()
+        render_cache = _render_cache
+    doc.render_cache = render_cache or None
+    with _a85_lock:
+        use_a85 = rl_config.useA85
+        rl_config.useA85 = int(settings["ascii85"])
+        try:
+            doc.build(
+                build_story(data),
+                onFirstPage=_on_page(draw_first_page),  # header + banner
+                onLaterPages=_on_page(draw_header),      # only compact header
+                canvasmaker=canvasmaker,
+            )
+        finally:
+            rl_config.useA85 = use_a85
+    if target is not output:
+        pdf = target.getvalue()
+        if repacked:
+            pdf = repack(pdf, **writer_options(settings))
+        if isinstance(output, str):
+            write_atomic(output, pdf)
+        else:
+            output.write(pdf)
+    return doc
+
+
+# ---------- OUTPUT CACHE ----------
+def _referenced_images(data):
+    names = [data["profile_image"]]
+    names += [card["image"] for card in data["image_cards"]]
+    names += [passion["image"] for passion in data["passions"]]
+    return sorted({image_path(name) for name in names})
+
+
+def build_key(data=None, image_dpi=None, profile=DEFAULT_PROFILE):
+    # Hash of everything a finished PDF depends on: the data, the output
+    # profile, the contents of the images and fonts it uses, colours and
+    # paragraph styles (which a theme may change at runtime) and the
+    # generator version. Builds are invariant, so equal keys mean equal bytes.
+    data = dict(DEFAULT_DATA, **(data or {}))
+    settings = get_profile(profile)
+    return content_key(
+        data,
+        image_dpi or settings["image_dpi"],
+        settings,
+        {path: file_hash(path) for path in _referenced_images(data)},
+        {name: file_hash(path) for name, path in FONT_FILES.items()},
+        palette(),
+        PREBAKED_SHAPES,
+        {name: vars(style) for name, style in get_styles().items()},
+        GENERATOR_VERSION,
+    )
+
 
-print("Multi-page portfolio PDF created successfully.")
+def build_portfolio_cached(data=None, output=OUTPUT_PDF, image_dpi=None,
+                           cache=None, build=None, profile=DEFAULT_PROFILE):
+    # Returns True when the PDF came from cache, an OutputCache; missing
+    # files count as changed inputs and are left for the build to report.
+    # build(data, output, image_dpi, profile=profile) makes the PDF on a miss.
+    build = build or build_portfolio
+    cache = cache or OutputCache()
+    try:
+        key = build_key(data, image_dpi, profile)
+    except OSError:
+        key = None
+    pdf = cache.get(key) if key else None
+    hit = pdf is not None
+    if not hit:
+        out = io.BytesIO()
+        build(data, out, image_dpi, profile=profile)
+        pdf = out.getvalue()
+        if key:
+            cache.put(key, pdf)
+    if isinstance(output, str):
+        write_atomic(output, pdf)
+    else:
+        output.write(pdf)
+    return hit
+
+
+# ---------- PARALLEL BUILD ----------
+def _render_pages(job):
+    data, pages, image_dpi, profile = job
+    out = io.BytesIO()
+    build_portfolio(data, out, image_dpi, draw_pages=set(pages), profile=profile)
+    return out.getvalue()
+
+
+def build_portfolio_parallel(data=None, output=OUTPUT_PDF, workers=None,
+                             image_dpi=None, profile=DEFAULT_PROFILE):
+    # Two phases: a layout pass that draws nothing finds the page count,
+    # then each worker lays the document out again (cheap) and draws one
+    # contiguous range of pages. The ranges are stitched in order with
+    # shared images and forms stored once.
+    workers = workers or os.cpu_count()
+    layout = build_portfolio(data, io.BytesIO(), image_dpi, draw_pages=(), profile=profile)
+    page_count = layout.page
+    if workers < 2 or page_count < PARALLEL_MIN_PAGES:
+        return build_portfolio(data, output, image_dpi, profile=profile)
+
+    step = -(-page_count // workers)
+    ranges = [range(first, min(first + step, page_count + 1))
+              for first in range(1, page_count + 1, step)]
+    with ProcessPoolExecutor(len(ranges), initializer=register_fonts) as pool:
+        parts = list(pool.map(_render_pages, [(data, list(r), image_dpi, profile)
+                                               for r in ranges]))
+
+    target = io.BytesIO() if isinstance(output, str) else output
+    writer = StreamingWriter(target, dedupe=True, **writer_options(get_profile(profile)))
+    readers = [PdfReader(io.BytesIO(part)) for part in parts]
+    for pages, reader in zip(ranges, readers):
+        for number, page in enumerate(iter_pages(reader), 1):
+            if number in pages:
+                writer.add_page(page)
+    # every part is the same invariant document, so the first one's
+    # catalog entries and /Info are the serial build's
+    trailer = readers[0].trailer
+    root = trailer["/Root"].get_object()
+    writer.close({key: value for key, value in root.items() if key not in ("/Type", "/Pages")},
+                 trailer.raw_get("/Info") if "/Info" in trailer else None)
+    if target is not output:
+        write_atomic(output, target.getvalue())
+    return layout
+
+
+def write_atomic(path, content):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+def load_data(path):
+    if path is None:
+        return DEFAULT_DATA
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ---------- WATCH ----------
+def watch(data_path, output, profile=DEFAULT_PROFILE):
+    # Stay warm and rebuild on change. Images and the render cache are keyed
+    # by content, so only what a change touched is redone; fonts are
+    # re-registered when they change, and code changes restart the process.
+    data = load_data(data_path)
+    paths = [IMG_DIR, FONT_DIR] + GENERATOR_FILES
+    if data_path:
+        paths.append(os.path.abspath(data_path))
+    print(f"Watching {', '.join(paths)} (Ctrl+C to stop)")
+
+    for changed in watch_changes(paths):
+        if changed & set(GENERATOR_FILES):
+            print("Generator code changed, restarting.")
+            os.execv(sys.executable, [sys.executable] + sys.argv)
+        if any(os.path.dirname(path) == FONT_DIR for path in changed):
+            register_fonts(reload=True)
+        if data_path and os.path.abspath(data_path) in changed:
+            try:
+                data = load_data(data_path)
+            except ValueError as exc:
+                print(f"Skipping rebuild, {data_path} is not valid JSON: {exc}")
+                continue
+            except OSError as exc:
+                # editors that save by rename leave it missing for a moment
+                print(f"Skipping rebuild, can't read {data_path}: {exc}")
+                continue
+
+        start = time.perf_counter()
+        try:
+            build_portfolio(data, output, profile=profile)
+        except Exception as exc:
+            print(f"Rebuild failed: {type(exc).__name__}: {' '.join(str(exc).split())}")
+            continue
+        names = ", ".join(sorted(os.path.basename(path) for path in changed))
+        print(f"Rebuilt {output} in {time.perf_counter() - start:.3f}s ({names})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the portfolio PDF.")
+    parser.add_argument("-o", "--output", default=OUTPUT_PDF)
+    parser.add_argument("--data", help="JSON file with the portfolio data "
+                        "(default: DEFAULT_DATA)")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="worker processes drawing pages in parallel "
+                        "(default 1; 0 means one per CPU)")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and rebuild when the data, "
+                        "images or fonts change")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always build, even when an identical PDF is cached")
+    parser.add_argument("--profile", choices=PROFILES, default=DEFAULT_PROFILE,
+                        help="output profile: draft builds fastest, web is smallest, "
+                             f"print keeps images lossless (default {DEFAULT_PROFILE})")
+    args = parser.parse_args(argv)
+
+    data = load_data(args.data)
+    if args.jobs == 1:
+        build = build_portfolio
+    else:
+        def build(data, output, image_dpi, profile=DEFAULT_PROFILE):
+            return build_portfolio_parallel(data, output, args.jobs or None, image_dpi,
+                                            profile)
+    if args.no_cache:
+        build(data, args.output, None, profile=args.profile)
+    elif build_portfolio_cached(data, args.output, build=build, profile=args.profile):
+        print("Inputs unchanged, copied the cached PDF.")
+    print("Multi-page portfolio PDF created successfully.")
+    if args.watch:
+        try:
+            watch(args.data, args.output, args.profile)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
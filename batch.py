@@ -0,0 +1,107 @@
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import Portfolio
+from profiles import DEFAULT_PROFILE, PROFILES
+
+
+# ---------- MANIFEST ----------
+def load_manifest(path):
+    # a .json file holds a list of records, anything else is read as JSONL
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".json"):
+            return json.load(f)
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def output_name(index, record):
+    # "id" wins, then the person's name; the index keeps names unique
+    label = str(record.get("id") or record.get("name") or "portfolio")
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_") or "portfolio"
+    return f"{index:05d}_{slug}.pdf"
+
+
+# ---------- WORKERS ----------
+def _init_worker():
+    Portfolio.register_fonts()
+
+
+def _render(job):
+    index, record, output, use_cache, profile = job
+    start = time.perf_counter()
+    cached = False
+    try:
+        if use_cache:
+            cached = Portfolio.build_portfolio_cached(record, output, profile=profile)
+        else:
+            Portfolio.build_portfolio(record, output, profile=profile)
+        error = None
+    except Exception as exc:
+        # ReportLab errors span several lines; keep the report one line each
+        error = f"{type(exc).__name__}: {' '.join(str(exc).split())}"
+    return {
+        "index": index,
+        "output": output,
+        "seconds": time.perf_counter() - start,
+        "cached": cached,
+        "error": error,
+    }
+
+
+def render_batch(records, out_dir, workers=None, use_cache=True, profile=DEFAULT_PROFILE):
+    # with use_cache, records whose inputs haven't changed since any
+    # earlier build are copied from the output cache instead of rendered
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [
+        (i, record, os.path.join(out_dir, record.get("output") or output_name(i, record)),
+         use_cache, profile)
+        for i, record in enumerate(records)
+    ]
+
+    # map() yields in submission order, so results line up with the manifest
+    # no matter which worker finishes first
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        return list(pool.map(_render, jobs))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Render one portfolio PDF per manifest record.")
+    parser.add_argument("manifest", help="JSONL file (or .json list) of portfolio records")
+    parser.add_argument("-o", "--out", default="portfolios", help="output directory")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(),
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="render every record, even when its PDF is cached")
+    parser.add_argument("--profile", choices=PROFILES, default=DEFAULT_PROFILE,
+                        help=f"output profile, see profiles.py (default {DEFAULT_PROFILE})")
+    args = parser.parse_args()
+
+    records = load_manifest(args.manifest)
+    start = time.perf_counter()
+    results = render_batch(records, args.out, args.workers, not args.no_cache, args.profile)
+    elapsed = time.perf_counter() - start
+
+    failures = 0
+    for result in results:
+        if result["error"]:
+            failures += 1
+            print(f"[{result['index']:5d}] FAILED {result['seconds']:7.3f}s  {result['error']}")
+        else:
+            status = "cached" if result["cached"] else "ok"
+            print(f"[{result['index']:5d}] {status:<6} {result['seconds']:7.3f}s  {result['output']}")
+
+    cached = sum(result["cached"] for result in results)
+    print(
+        f"{len(results) - failures}/{len(results)} rendered ({cached} from cache) in {elapsed:.2f}s "
+        f"({len(results) / elapsed:.2f} portfolios/s, {args.workers} workers)"
+    )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
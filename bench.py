@@ -0,0 +1,515 @@
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import re
+import sys
+import time
+from collections import defaultdict
+
+import Portfolio
+import trial
+from profiles import PROFILES
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+KINDS = ["projects", "certificates", "images"]
+RESULTS_JSON = "bench_results.json"
+
+# flowable methods timed during a run; times are inclusive, so a grid's
+# draw contains the draws of its cards
+TIMED = {
+    "CertificateCards": ("wrap", "split", "draw"),
+    "ProjectCard": ("wrap", "draw"),
+    "ImageCard": ("wrap", "draw"),
+    "Grid": ("wrap", "split", "draw"),
+    "PersonalPassion": ("wrap", "draw"),
+    "LetsConnectCard": ("wrap", "draw"),
+}
+
+
+# ---------- SYNTHETIC DATA ----------
+def synthetic_data(kind, size):
+    base = Portfolio.DEFAULT_DATA
+    data = dict(base, projects=[], image_cards=[], certificates=[])
+
+    if kind == "projects":
+        data["projects"] = [
+            dict(project, title=f"{project['title']} {i}")
+            for i, project in enumerate(base["projects"] * (size // 2 + 1))
+        ][:size]
+    elif kind == "certificates":
+        flat = [cert for group in base["certificates"] for cert in group]
+        certs = [(f"{c[0]} {i}",) + tuple(c[1:])
+                 for i, c in enumerate(flat * (size // len(flat) + 1))][:size]
+        # one group, split across pages by CertificateCards itself
+        data["certificates"] = [certs]
+    elif kind == "images":
+        data["image_cards"] = [
+            dict(card, caption=f"{card['caption']} {i}")
+            for i, card in enumerate(base["image_cards"] * (size // 2 + 1))
+        ][:size]
+    else:
+        raise ValueError(f"unknown benchmark kind {kind!r}")
+    return data
+
+
+# ---------- TIMING ----------
+def _instrument(timings):
+    def timed(name, method):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                entry = timings[name]
+                entry["calls"] += 1
+                entry["seconds"] += time.perf_counter() - start
+        return wrapper
+
+    for cls_name, methods in TIMED.items():
+        cls = getattr(Portfolio, cls_name)
+        for method in methods:
+            setattr(cls, method, timed(f"{cls_name}.{method}", getattr(cls, method)))
+
+
+def _rss_kb(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise OSError(f"no {field} in /proc/self/status")
+
+
+def _reset_peak():
+    # Starts this process's peak RSS (VmHWM) over from what it holds now;
+    # False where that isn't possible (needs Linux). ru_maxrss can't be
+    # used instead: Linux starts a new process's at its parent's RSS.
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def _run_case(kind, size, repeat):
+    # runs in a fresh process so peak RSS belongs to this case alone
+    measured = _reset_peak()
+    Portfolio.build_portfolio(synthetic_data(kind, 2), io.BytesIO(),
+                              render_cache=False)  # fonts, image cache
+
+    timings = defaultdict(lambda: {"calls": 0, "seconds": 0.0})
+    _instrument(timings)
+    data = synthetic_data(kind, size)
+
+    # keep the fastest of `repeat` builds; the minimum is the least noisy
+    # estimate of what the code costs
+    best = None
+    for _ in range(repeat):
+        timings.clear()
+        out = io.BytesIO()
+        start = time.perf_counter()
+        Portfolio.build_portfolio(data, out, render_cache=False)
+        wall = time.perf_counter() - start
+        if best is None or wall < best[0]:
+            best = (wall, dict(timings), out.getvalue())
+
+    wall, flowables, pdf = best
+    return {
+        "wall_seconds": wall,
+        "peak_rss_kb": _rss_kb("VmHWM") if measured else None,
+        "output_bytes": len(pdf),
+        "pages": len(re.findall(rb"/Type /Page\b(?!s)", pdf)),
+        "flowables": flowables,
+    }
+
+
+def run(kinds, sizes, repeat=3):
+    ctx = multiprocessing.get_context("spawn")
+    cases = {}
+    for kind in kinds:
+        for size in sizes:
+            with ctx.Pool(1) as pool:
+                result = pool.apply(_run_case, (kind, size, repeat))
+            cases[f"{kind}-{size}"] = result
+            peak = result["peak_rss_kb"]
+            print(f"{kind:>12} {size:>6}: {result['wall_seconds']:8.3f}s "
+                  f"{result['pages']:5d} pages {result['output_bytes']:>11,} bytes "
+                  + (f"peak {peak / 1024:7.1f} MB" if peak is not None else "peak       - MB"),
+                  flush=True)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "cases": cases,
+    }
+
+
+# ---------- RASTERIZING ----------
+def raster(scale=2.0, repeat=5):
+    # Builds the default portfolio with clipped and with pre-baked image
+    # shapes and times how long a renderer takes to rasterize each page,
+    # which is roughly what a viewer pays on every scroll or zoom.
+    try:
+        import pypdfium2
+    except ImportError:
+        raise SystemExit("bench.py raster needs pypdfium2 (pip install pypdfium2)")
+
+    results = {}
+    for prebaked in (False, True):
+        Portfolio.PREBAKED_SHAPES = prebaked
+        out = io.BytesIO()
+        Portfolio.build_portfolio(None, out, render_cache=False)
+        pdf = pypdfium2.PdfDocument(out.getvalue())
+        pages = []
+        for index in range(len(pdf)):
+            page = pdf[index]
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                page.render(scale=scale)
+                seconds = time.perf_counter() - start
+                best = seconds if best is None else min(best, seconds)
+            pages.append(best)
+        name = "prebaked" if prebaked else "clipped"
+        results[name] = {"output_bytes": len(out.getvalue()), "page_seconds": pages}
+    Portfolio.PREBAKED_SHAPES = True
+
+    for name, result in results.items():
+        pages = " ".join(f"{s * 1000:6.1f}" for s in result["page_seconds"])
+        print(f"{name:>9}: {result['output_bytes']:>9,} bytes  "
+              f"ms per page at {scale * 72:.0f} dpi: {pages}  "
+              f"total {sum(result['page_seconds']) * 1000:.1f}")
+    return results
+
+
+# ---------- FONTS ----------
+def _font_case(cache_dir, builds):
+    # runs in a fresh process: font registration is a per-process cost
+    import font_cache
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    if cache_dir is None:
+        Portfolio.load_font = TTFont  # parse and subset every time
+    else:
+        font_cache.FONT_CACHE_DIR = cache_dir
+        font_cache.SUBSET_DIR = f"{cache_dir}/subsets"
+
+    font_seconds = [0.0]
+    add_objects = TTFont.addObjects
+
+    def timed_add_objects(self, doc):
+        # embedding: subset programs, widths and ToUnicode maps
+        start = time.perf_counter()
+        try:
+            return add_objects(self, doc)
+        finally:
+            font_seconds[0] += time.perf_counter() - start
+    TTFont.addObjects = timed_add_objects
+
+    start = time.perf_counter()
+    Portfolio.register_fonts()
+    register = time.perf_counter() - start
+    data = synthetic_data("projects", 4)
+    for i in range(builds):
+        Portfolio.build_portfolio(dict(data, name=f"Person {i}"), io.BytesIO(),
+                                  render_cache=False)
+    total = time.perf_counter() - start
+    return {"register_seconds": register, "embed_seconds": font_seconds[0],
+            "total_seconds": total,
+            "font_share": (register + font_seconds[0]) / total}
+
+
+def fonts(builds=20):
+    # font cost of a batch of `builds` portfolios in one worker process,
+    # parsing and subsetting every time vs through font_cache, with an
+    # empty cache and again with a filled one
+    import tempfile
+
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for name, directory in (("uncached", None), ("cache cold", cache_dir),
+                                ("cache warm", cache_dir)):
+            with ctx.Pool(1) as pool:
+                result = results[name] = pool.apply(_font_case, (directory, builds))
+            print(f"{name:>10}: register {result['register_seconds'] * 1000:6.2f} ms  "
+                  f"embed {result['embed_seconds'] * 1000 / builds:6.2f} ms/build  "
+                  f"total {result['total_seconds']:6.3f}s  "
+                  f"fonts {result['font_share']:6.2%} of the time", flush=True)
+    return results
+
+
+# ---------- PROFILES ----------
+def _best_of(repeat, fn):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def profiles(size=0, repeat=3):
+    # Build time and bytes per output profile: the generator building the
+    # portfolio (synthetic with `size` projects, or the default one), and
+    # trial.py normalizing what the standard profile built (for the
+    # profiles it offers). Image copies
+    # are prepared once before timing, so builds measure embedding and
+    # writing, not resampling.
+    import tempfile
+
+    data = synthetic_data("projects", size) if size else None
+    source = io.BytesIO()
+    Portfolio.build_portfolio(data, source)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "source.pdf")
+        with open(src, "wb") as f:
+            f.write(source.getvalue())
+        for name in PROFILES:
+            def build():
+                out = io.BytesIO()
+                Portfolio.build_portfolio(data, out, render_cache=False, profile=name)
+                return len(out.getvalue())
+            build()  # prepares this profile's image copies
+            build_seconds, build_bytes = _best_of(repeat, build)
+
+            results[name] = {"build_seconds": build_seconds, "build_bytes": build_bytes,
+                             "trial_seconds": None, "trial_bytes": None}
+            if name in trial.TRIAL_PROFILES:
+                dst = os.path.join(tmp, f"{name}.pdf")
+                trial_seconds, _ = _best_of(repeat, lambda: trial.normalize_pdf(
+                    src, dst, profile=name))
+                results[name].update(trial_seconds=trial_seconds,
+                                     trial_bytes=os.path.getsize(dst))
+
+    print(f"{'profile':>9}  {'build ms':>9} {'bytes':>11}   {'trial.py ms':>11} {'bytes':>11}")
+    for name, r in results.items():
+        trial_columns = (f"{'-':>11} {'-':>11}" if r["trial_seconds"] is None else
+                         f"{r['trial_seconds'] * 1000:11.1f} {r['trial_bytes']:>11,}")
+        print(f"{name:>9}  {r['build_seconds'] * 1000:9.1f} {r['build_bytes']:>11,}   "
+              + trial_columns)
+    return results
+
+
+# ---------- CHECKS ----------
+# text beyond DEFAULT_DATA: accents, typographic punctuation and code
+# points the fonts have no glyph for
+EXTRA_TEXT = ["café naïve – “quoted” …", "日本語 ✓ ★", "", " ", "x"]
+
+
+def _strings(value):
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _strings(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _strings(item)
+
+
+def check_widths():
+    # metrics.measure must give exactly what stringWidth gives, for the
+    # vectorized TrueType path (Jost) and the Type1 fallback (Helvetica)
+    import metrics
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    Portfolio.register_fonts()
+    strings = list(_strings(Portfolio.DEFAULT_DATA)) + EXTRA_TEXT
+    failures = []
+    for font in ("Jost", "Jost-Bold", "Helvetica", "Helvetica-Bold"):
+        for size in (7, 10.5, 24):
+            expected = [stringWidth(s, font, size) for s in strings]
+            got = metrics.measure(strings, font, size)
+            failures += [f"{font} {size}: {s!r} measured {g!r}, stringWidth {e!r}"
+                         for s, g, e in zip(strings, got, expected) if g != e]
+    return failures
+
+
+# trial.py --incremental on a MEMORY_PAGES page input may grow peak RSS
+# by at most MEMORY_BOUND_MB, and by at most MEMORY_RATIO of what the
+# in-memory path grows it by
+MEMORY_PAGES = 5000
+MEMORY_BOUND_MB = 32
+MEMORY_RATIO = 0.5
+
+
+def _synthetic_pdf(path, pages):
+    # wider than A4, so every page is scaled; text, a path and a link each
+    from reportlab.pdfgen.canvas import Canvas
+
+    canv = Canvas(path, pagesize=(800, 1000))
+    for i in range(pages):
+        for line in range(8):
+            canv.drawString(40, 940 - line * 30, f"Page {i} line {line} " + "lorem ipsum " * 6)
+        canv.rect(30, 30, 740, 940)
+        canv.linkURL(f"https://example.com/{i}", (40, 40, 200, 60))
+        canv.showPage()
+    canv.save()
+
+
+def _normalize_peak(src, dst, incremental):
+    # Runs in a fresh process: how far (KB) one normalize_pdf raises peak
+    # RSS above what the process holds before it (see _reset_peak)
+    import trial
+
+    _reset_peak()
+    before = _rss_kb("VmRSS")
+    trial.normalize_pdf(src, dst, incremental=incremental)
+    return _rss_kb("VmHWM") - before
+
+
+def check_memory():
+    # the incremental writer's peak memory must not grow with page count
+    import tempfile
+
+    if not os.path.exists("/proc/self/clear_refs"):
+        return ["needs Linux (/proc/self/clear_refs) to measure peak RSS"]
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "synthetic.pdf")
+        _synthetic_pdf(src, MEMORY_PAGES)
+        growth = {}
+        for incremental in (True, False):
+            with ctx.Pool(1) as pool:
+                growth[incremental] = pool.apply(_normalize_peak, (
+                    src, os.path.join(tmp, "out.pdf"), incremental)) / 1024
+
+    print(f"  {MEMORY_PAGES} pages: peak RSS +{growth[True]:.1f} MB incremental, "
+          f"+{growth[False]:.1f} MB in memory")
+    failures = []
+    if growth[True] > MEMORY_BOUND_MB:
+        failures.append(f"incremental grew {growth[True]:.1f} MB, bound {MEMORY_BOUND_MB} MB")
+    if growth[True] > growth[False] * MEMORY_RATIO:
+        failures.append(f"incremental grew {growth[True]:.1f} MB, more than "
+                        f"{MEMORY_RATIO:.0%} of the in-memory {growth[False]:.1f} MB")
+    return failures
+
+
+CHECKS = {"widths": check_widths, "memory": check_memory}
+
+
+def check(names):
+    # runs the named checks; returns the number that failed
+    failed = 0
+    for name in names:
+        failures = CHECKS[name]()
+        print(f"{name}: {'FAIL' if failures else 'ok'}")
+        for line in failures:
+            print(f"  {line}")
+        failed += bool(failures)
+    return failed
+
+
+# ---------- COMPARE ----------
+# timing differences smaller than this are scheduler noise, not regressions
+MIN_DELTA_SECONDS = 0.02
+
+
+def compare(baseline, current, threshold):
+    regressions = []
+
+    def check(label, old, new, min_delta=0):
+        # None: not measured on one side (peak RSS needs Linux)
+        if old and new is not None and new > old * (1 + threshold) and new - old > min_delta:
+            regressions.append(f"{label}: {old:.4g} -> {new:.4g} (+{(new / old - 1) * 100:.0f}%)")
+
+    for case, new in current["cases"].items():
+        old = baseline["cases"].get(case)
+        if old is None:
+            continue
+        check(f"{case} wall_seconds", old["wall_seconds"], new["wall_seconds"],
+              MIN_DELTA_SECONDS)
+        for metric in ("peak_rss_kb", "output_bytes"):
+            check(f"{case} {metric}", old[metric], new[metric])
+        for name, timer in new["flowables"].items():
+            old_timer = old["flowables"].get(name)
+            if old_timer:
+                check(f"{case} {name}", old_timer["seconds"], timer["seconds"],
+                      MIN_DELTA_SECONDS)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rendering benchmarks.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_p = sub.add_parser("run", help="build synthetic portfolios and record timings")
+    run_p.add_argument("--kinds", nargs="+", choices=KINDS, default=KINDS)
+    run_p.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    run_p.add_argument("--repeat", type=int, default=3,
+                       help="builds per case, the fastest is kept (default 3)")
+    run_p.add_argument("-o", "--output", default=RESULTS_JSON)
+
+    cmp_p = sub.add_parser("compare", help="flag regressions against a baseline")
+    cmp_p.add_argument("baseline")
+    cmp_p.add_argument("current", nargs="?", default=RESULTS_JSON)
+    cmp_p.add_argument("--threshold", type=float, default=0.10,
+                       help="allowed slowdown/growth as a fraction (default 0.10)")
+
+    raster_p = sub.add_parser("raster", help="rasterize pages built with clipped "
+                              "and with pre-baked image shapes")
+    raster_p.add_argument("--scale", type=float, default=2.0,
+                          help="render scale, 1 = 72 dpi (default 2)")
+    raster_p.add_argument("--repeat", type=int, default=5,
+                          help="renders per page, the fastest is kept (default 5)")
+
+    fonts_p = sub.add_parser("fonts", help="font parsing and subsetting time "
+                             "with and without the font cache")
+    fonts_p.add_argument("--builds", type=int, default=20,
+                         help="portfolios built per process (default 20)")
+
+    profiles_p = sub.add_parser("profiles", help="build time and output size "
+                                "per output profile, generator and trial.py")
+    profiles_p.add_argument("--size", type=int, default=0,
+                            help="synthetic projects to build (default: the default portfolio)")
+    profiles_p.add_argument("--repeat", type=int, default=3,
+                            help="builds per profile, the fastest is kept (default 3)")
+
+    check_p = sub.add_parser("check", help="correctness and memory checks; "
+                             "exits non-zero when one fails")
+    check_p.add_argument("checks", nargs="*", metavar="CHECK",
+                         help=f"checks to run: {', '.join(CHECKS)} (default: all)")
+
+    args = parser.parse_args()
+    if args.command == "check":
+        unknown = set(args.checks) - set(CHECKS)
+        if unknown:
+            check_p.error(f"unknown checks: {', '.join(sorted(unknown))}")
+        return 1 if check(args.checks or sorted(CHECKS)) else 0
+    if args.command == "profiles":
+        profiles(args.size, args.repeat)
+        return 0
+    if args.command == "fonts":
+        fonts(args.builds)
+        return 0
+    if args.command == "raster":
+        raster(args.scale, args.repeat)
+        return 0
+    if args.command == "run":
+        results = run(args.kinds, args.sizes, args.repeat)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, args.threshold)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
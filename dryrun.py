@@ -0,0 +1,337 @@
+import argparse
+import io
+import json
+import sys
+import time
+from types import SimpleNamespace
+
+from reportlab.pdfbase.pdfmetrics import getAscentDescent, stringWidth
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus import Paragraph
+
+import Portfolio
+from batch import load_manifest
+
+# boxes may poke out of a frame or into each other by this much (points)
+TOLERANCE = 0.5
+
+
+# ---------- EXTENTS ----------
+def _union(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+
+
+def _intersect(a, b):
+    if a is None:
+        return b
+    box = [max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])]
+    return box if box[0] < box[2] and box[1] < box[3] else None
+
+
+def _text_box(x, y, text, font, size):
+    ascent, descent = getAscentDescent(font, size)
+    return [x, y + descent, x + stringWidth(text, font, size), y + ascent]
+
+
+class _PathExtents:
+    def __init__(self):
+        self.box = None
+
+    def rect(self, x, y, width, height, *args, **kwargs):
+        self.box = _union(self.box, [min(x, x + width), min(y, y + height),
+                                     max(x, x + width), max(y, y + height)])
+
+    def roundRect(self, x, y, width, height, radius, *args, **kwargs):
+        self.rect(x, y, width, height)
+
+    def circle(self, x, y, r, *args, **kwargs):
+        self.rect(x - r, y - r, 2 * r, 2 * r)
+
+
+class _TextExtents:
+    def __init__(self, canv, x, y):
+        self._canv = canv
+        self._x = x
+        self._y = y
+        self._font, self._size, self._leading = canv._font
+        self.boxes = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None  # colours and the like
+
+    def setFont(self, font, size, leading=None):
+        self._font, self._size = font, size
+        self._leading = leading or self._leading
+
+    def setLeading(self, leading):
+        self._leading = leading
+
+    def textLine(self, text=""):
+        self.boxes.append(_text_box(self._x, self._y, text, self._font, self._size))
+        self._y -= self._leading
+
+    def getY(self):
+        return self._y
+
+
+class ExtentCanvas:
+    # Stands in for a canvas while something draws and keeps the box of
+    # everything it paints, in page coordinates: text is measured, shapes
+    # are boxed, images are only placed (draw_image skips resampling for
+    # it) and nothing is encoded. Clipping narrows what follows it.
+    # Translate and scale are the only transforms the portfolio uses.
+    extents_only = True
+
+    def __init__(self, doc):
+        self._doctemplate = doc
+        self._ctm = (1, 1, 0, 0)
+        self._clip = None
+        self._font = ("Helvetica", 12, 14.4)
+        self._stack = []
+        self.box = None
+        self.boxes = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None  # colours, links, line styles
+
+    def _paint(self, box):
+        if box is None:
+            return
+        a, d, e, f = self._ctm
+        xs = (a * box[0] + e, a * box[2] + e)
+        ys = (d * box[1] + f, d * box[3] + f)
+        box = _intersect(self._clip, [min(xs), min(ys), max(xs), max(ys)])
+        if box is not None:
+            self.boxes.append(box)
+            self.box = _union(self.box, box)
+
+    def saveState(self):
+        self._stack.append((self._ctm, self._clip, self._font))
+
+    def restoreState(self):
+        self._ctm, self._clip, self._font = self._stack.pop()
+
+    def translate(self, dx, dy):
+        a, d, e, f = self._ctm
+        self._ctm = (a, d, e + a * dx, f + d * dy)
+
+    def scale(self, sx, sy):
+        a, d, e, f = self._ctm
+        self._ctm = (a * sx, d * sy, e, f)
+
+    def setFont(self, font, size, leading=None):
+        self._font = (font, size, leading or size * 1.2)
+
+    def stringWidth(self, text, font, size):
+        return stringWidth(text, font, size)
+
+    def hasForm(self, name):
+        return False  # forms are drawn in place
+
+    def rect(self, x, y, width, height, stroke=1, fill=0, **kwargs):
+        if stroke or fill:
+            path = _PathExtents()
+            path.rect(x, y, width, height)
+            self._paint(path.box)
+
+    def roundRect(self, x, y, width, height, radius, stroke=1, fill=0, **kwargs):
+        self.rect(x, y, width, height, stroke, fill)
+
+    def circle(self, x, y, r, stroke=1, fill=0, **kwargs):
+        self.rect(x - r, y - r, 2 * r, 2 * r, stroke, fill)
+
+    def drawImage(self, image, x, y, width=None, height=None, **kwargs):
+        self.rect(x, y, width, height, fill=1)
+
+    def drawString(self, x, y, text, *args, **kwargs):
+        self._paint(_text_box(x, y, text, *self._font[:2]))
+
+    def drawCentredString(self, x, y, text, *args, **kwargs):
+        self.drawString(x - stringWidth(text, *self._font[:2]) / 2, y, text)
+
+    def drawRightString(self, x, y, text, *args, **kwargs):
+        self.drawString(x - stringWidth(text, *self._font[:2]), y, text)
+
+    def beginText(self, x=0, y=0):
+        return _TextExtents(self, x, y)
+
+    def drawText(self, text):
+        for box in text.boxes:
+            self._paint(box)
+
+    def beginPath(self):
+        return _PathExtents()
+
+    def drawPath(self, path, stroke=1, fill=0, **kwargs):
+        if stroke or fill:
+            self._paint(path.box)
+
+    def clipPath(self, path, stroke=1, fill=0, **kwargs):
+        if stroke or fill:
+            self._paint(path.box)
+        a, d, e, f = self._ctm
+        box = path.box
+        xs = (a * box[0] + e, a * box[2] + e)
+        ys = (d * box[1] + f, d * box[3] + f)
+        self._clip = _intersect(self._clip, [min(xs), min(ys), max(xs), max(ys)])
+
+
+class _LayoutCanvas(Canvas):
+    def save(self):
+        pass  # a dry run never writes the PDF
+
+
+# ---------- CHECKS ----------
+def _overlap(a, b):
+    return (min(a[2], b[2]) - max(a[0], b[0]) > TOLERANCE
+            and min(a[3], b[3]) - max(a[1], b[1]) > TOLERANCE)
+
+
+def _rounded(box):
+    return [round(v, 1) for v in box]
+
+
+def dry_run(data=None):
+    # Lays the portfolio out without drawing it and checks where things
+    # landed: each story flowable's wrapped box and the box it actually
+    # paints, anything painted outside its page's frame (frame_first on
+    # page one, frame_later after) and elements that overlap, including
+    # the page chrome drawn by draw_first_page and draw_header.
+    start = time.perf_counter()
+    doc = Portfolio.build_portfolio(data, io.BytesIO(), draw_pages=(),
+                                    render_cache=False, canvasmaker=_LayoutCanvas)
+    stand_in = SimpleNamespace(portfolio=doc.portfolio, render_cache=None,
+                               images=None, image_dpi=doc.image_dpi)
+
+    elements = []
+    for page, x, y, width, height, flowable in doc.placements:
+        name = type(flowable).__name__
+        box = [x, y, x + width, y + height]
+        if type(flowable).__module__ == Portfolio.__name__:
+            canv = ExtentCanvas(stand_in)
+            type(flowable).drawOn(flowable, canv, x, y)
+            drawn = canv.box
+        elif isinstance(flowable, Paragraph):
+            drawn = box  # ReportLab keeps paragraphs inside their box
+        else:
+            drawn = None  # spacers and breaks paint nothing
+        elements.append({"page": page, "name": name, "box": box, "drawn": drawn})
+
+    # page chrome keeps every painted box, not just their union: the banner
+    # and the skill boxes are far apart
+    chrome = []
+    for page in range(1, doc.page + 1):
+        canv = ExtentCanvas(stand_in)
+        draw = Portfolio.draw_first_page if page == 1 else Portfolio.draw_header
+        draw(canv, stand_in)
+        chrome.extend((page, draw.__name__, box) for box in canv.boxes)
+
+    overflows = []
+    escapes = []
+    overlaps = []
+    for i, element in enumerate(elements):
+        drawn = element["drawn"]
+        if drawn is None:
+            continue
+        frame = Portfolio.frame_first if element["page"] == 1 else Portfolio.frame_later
+        limits = [frame._x1, frame._y1, frame._x2, frame._y2]
+        past = {side: round(amount, 1) for side, amount in (
+            ("left", limits[0] - drawn[0]), ("bottom", limits[1] - drawn[1]),
+            ("right", drawn[2] - limits[2]), ("top", drawn[3] - limits[3]),
+        ) if amount > TOLERANCE}
+        if past:
+            overflows.append({"page": element["page"], "name": element["name"],
+                              "frame": frame.id, "past": past})
+
+        box = element["box"]
+        if (drawn[0] < box[0] - TOLERANCE or drawn[1] < box[1] - TOLERANCE
+                or drawn[2] > box[2] + TOLERANCE or drawn[3] > box[3] + TOLERANCE):
+            escapes.append({"page": element["page"], "name": element["name"],
+                            "box": _rounded(box), "drawn": _rounded(drawn)})
+
+        for other in elements[i + 1:]:
+            if (other["page"] == element["page"] and other["drawn"] is not None
+                    and _overlap(drawn, other["drawn"])):
+                overlaps.append({"page": element["page"],
+                                 "names": [element["name"], other["name"]]})
+        for page, name, box in chrome:
+            if page == element["page"] and _overlap(drawn, box):
+                overlaps.append({"page": page, "names": [element["name"], name]})
+                break
+
+    for element in elements:
+        element["box"] = _rounded(element["box"])
+        element["drawn"] = element["drawn"] and _rounded(element["drawn"])
+    return {
+        "pages": doc.page,
+        "milliseconds": round((time.perf_counter() - start) * 1000, 1),
+        "elements": elements,
+        "overflows": overflows,
+        "outside_box": escapes,
+        "overlaps": overlaps,
+    }
+
+
+def _problems(report):
+    return (len(report["overflows"]) + len(report["outside_box"]) + len(report["overlaps"])
+            + (report["error"] is not None))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Lay portfolios out without rendering them and report "
+                    "page counts, overflow and overlapping elements.")
+    parser.add_argument("inputs", nargs="*",
+                        help="portfolio JSON files or JSONL manifests "
+                             "(default: DEFAULT_DATA)")
+    parser.add_argument("--json", action="store_true",
+                        help="print the full reports as JSON")
+    args = parser.parse_args()
+
+    records = []
+    for path in args.inputs:
+        if path.endswith(".jsonl"):
+            records.extend((f"{path}:{i}", r) for i, r in enumerate(load_manifest(path), 1))
+        else:
+            records.append((path, Portfolio.load_data(path)))
+    records = records or [("DEFAULT_DATA", None)]
+
+    reports = []
+    for label, data in records:
+        try:
+            report = dry_run(data)
+            report["error"] = None
+        except Exception as exc:
+            # one bad record is a problem to report, not the end of the
+            # manifest; ReportLab errors span several lines, keep it one
+            report = {"pages": None, "milliseconds": None, "elements": [],
+                      "overflows": [], "outside_box": [], "overlaps": [],
+                      "error": f"{type(exc).__name__}: {' '.join(str(exc).split())}"}
+        report["input"] = label
+        reports.append(report)
+        if not args.json:
+            if report["error"] is not None:
+                print(f"{label}: failed, {report['error']}")
+                continue
+            print(f"{label}: {report['pages']} pages in {report['milliseconds']}ms, "
+                  f"{_problems(report)} problem(s)")
+            for item in report["overflows"]:
+                print(f"  page {item['page']}: {item['name']} past {item['frame']} frame "
+                      + ", ".join(f"{side} {amount}pt" for side, amount in item["past"].items()))
+            for item in report["outside_box"]:
+                print(f"  page {item['page']}: {item['name']} draws at {item['drawn']} "
+                      f"outside its box {item['box']}")
+            for item in report["overlaps"]:
+                print(f"  page {item['page']}: {' overlaps '.join(item['names'])}")
+    if args.json:
+        json.dump(reports, sys.stdout, indent=2)
+        print()
+    return 1 if any(_problems(r) for r in reports) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+from array import array
+from fnmatch import fnmatch
+from weakref import WeakKeyDictionary
+
+from reportlab import rl_config
+from reportlab.pdfbase import ttfonts
+from reportlab.pdfbase.ttfonts import TTEncoding, TTFont, TTFontFace, TTFNameBytes
+
+from image_cache import CACHE_DIR, file_hash
+
+FONT_CACHE_DIR = os.path.join(CACHE_DIR, "fonts")
+SUBSET_DIR = os.path.join(FONT_CACHE_DIR, "subsets")
+# part of every file name; bump it when the saved state changes shape
+CACHE_FORMAT = 2
+# face attributes that need converting to go through JSON: name strings,
+# and dicts keyed by code point or glyph index
+_NAMES = ("name", "familyName", "styleName", "fullName", "uniqueFontID")
+_INT_KEYED = ("charToGlyph", "glyphToChar", "charWidths", "glyphWidths")
+
+
+def _write_atomic(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+class CachedFontFace(TTFontFace):
+    # A parsed TrueType face that can be saved as plain JSON, so later
+    # processes load its tables instead of parsing the font again (the
+    # font program itself is read from the font file), and that keeps the
+    # subset font programs it makes: in memory for this process and on
+    # disk for every other one, keyed by the font's hash and the code
+    # points of the subset. ReportLab numbers a subset's glyphs in the
+    # order the document first uses them, so documents with the same text
+    # ask for the same subsets.
+    font_hash = None
+
+    def dumps(self):
+        # the parse as JSON: data only, so a cache file can't run code
+        state = dict(vars(self))
+        state.pop("_pdfScale", None)  # a lambda; rebuilt from unitsPerEm
+        state.pop("_subsets", None)
+        state.pop("_ttf_data", None)
+        for name in _NAMES:
+            state[name] = state[name].ustr
+        for name in _INT_KEYED:
+            state[name] = list(state[name].items())
+        state["subfontNameX"] = state["subfontNameX"].decode("latin-1")
+        return json.dumps(state, separators=(",", ":"))
+
+    @classmethod
+    def loads(cls, text, ttf_data):
+        # a face from dumps() output and the font file's bytes
+        state = json.loads(text)
+        for name in _NAMES:
+            state[name] = TTFNameBytes(state[name].encode("utf8"))
+        for name in _INT_KEYED:
+            state[name] = dict(state[name])
+        state["subfontNameX"] = state["subfontNameX"].encode("latin-1")
+        state["fontRevision"] = tuple(state["fontRevision"])
+        state["hmetrics"] = [tuple(metric) for metric in state["hmetrics"]]
+        state["_ttf_data"] = ttf_data
+        face = cls.__new__(cls)
+        face.__dict__.update(state)
+        scale = 1000 / face.unitsPerEm
+        face._pdfScale = (lambda x: x) if face.unitsPerEm == 1000 else (lambda x: x * scale)
+        return face
+
+    def makeSubset(self, subset):
+        subsets = self.__dict__.setdefault("_subsets", {})
+        key = hashlib.sha1(array("I", subset).tobytes()).hexdigest()
+        program = subsets.get(key)
+        if program is not None:
+            return program
+
+        path = os.path.join(SUBSET_DIR, f"{self.font_hash}-{key}.ttf")
+        try:
+            with open(path, "rb") as f:
+                program = f.read()
+        except OSError:
+            program = super().makeSubset(subset)
+            _write_atomic(path, program)
+        subsets[key] = program
+        return program
+
+
+def _load_face(cached, path):
+    # None for a missing, damaged or out-of-date cache file; the caller
+    # parses the font again and overwrites it
+    try:
+        with open(cached, encoding="utf-8") as f:
+            text = f.read()
+        with open(path, "rb") as f:
+            return CachedFontFace.loads(text, f.read())
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def load_font(name, path):
+    # A TTFont for the font file at path, built around a cached parse of
+    # it when there is one. Same arguments as TTFont(name, path).
+    digest = file_hash(path)
+    cached = os.path.join(FONT_CACHE_DIR, f"{digest}-{CACHE_FORMAT}.json")
+    face = _load_face(cached, path)
+    if face is None or face.font_hash != digest:
+        face = CachedFontFace(path)
+        face.font_hash = digest
+        _write_atomic(cached, face.dumps().encode("utf-8"))
+
+    # what TTFont.__init__ sets, with the face already made
+    font = TTFont.__new__(TTFont)
+    font.fontName = name
+    font.face = face
+    font.encoding = TTEncoding()
+    font.state = WeakKeyDictionary()
+    font._asciiReadable = rl_config.ttfAsciiReadable
+    font.shapable = not any(fnmatch(name, glob) for glob in ttfonts.unShapedFontGlob)
+    return font
@@ -0,0 +1,208 @@
+import hashlib
+import os
+
+from PIL import Image, ImageChops, ImageDraw
+from reportlab.lib.utils import ImageReader
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.environ.get(
+    "PORTFOLIO_CACHE_DIR", os.path.join(BASE_DIR, ".cache"))
+IMAGE_CACHE_DIR = os.path.join(CACHE_DIR, "images")
+
+# resolution images are resampled to, relative to their size on the page
+IMAGE_DPI = 150
+JPEG_QUALITY = 85
+# rounded corners are drawn this many times finer than the image, then
+# scaled down, which antialiases their edge
+MASK_SUPERSAMPLE = 4
+
+_source_hashes = {}
+
+
+def file_hash(path):
+    # hashing a multi-MB PNG on every draw adds up, so remember the digest
+    # until the file's size or mtime changes
+    st = os.stat(path)
+    key = (path, st.st_size, st.st_mtime_ns)
+    digest = _source_hashes.get(key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = _source_hashes[key] = h.hexdigest()
+    return digest
+
+
+def _has_alpha(im):
+    if im.mode in ("RGBA", "LA") or (im.mode == "P" and "transparency" in im.info):
+        alpha = im.convert("RGBA").getchannel("A")
+        return alpha.getextrema()[0] < 255
+    return False
+
+
+def _cover_crop(im, box_w, box_h):
+    # same geometry as the old runtime cover fit: scale to fill the box,
+    # keep the centre, drop what would have been clipped away
+    img_w, img_h = im.size
+    box_ratio = box_w / box_h
+    if img_w / img_h > box_ratio:
+        crop_w = img_h * box_ratio
+        left = (img_w - crop_w) / 2
+        return im.crop((round(left), 0, round(left + crop_w), img_h))
+    crop_h = img_w / box_ratio
+    top = (img_h - crop_h) / 2
+    return im.crop((0, round(top), img_w, round(top + crop_h)))
+
+
+def _rounded_mask(size, width, height, radius, grow=0):
+    # Antialiased L mask, `size` pixels, of a rounded rectangle covering a
+    # width x height point box with corners of `radius` points; grow
+    # widens it on every side by that many points (and the radius with
+    # it). Drawn in point space at MASK_SUPERSAMPLE times the image
+    # resolution, so corners stay round when the image is stretched.
+    k = MASK_SUPERSAMPLE * max(size[0] / width, size[1] / height)
+    mask = Image.new("L", (round(width * k), round(height * k)), 0)
+    ImageDraw.Draw(mask).rounded_rectangle(
+        (-grow * k, -grow * k, (width + grow) * k - 1, (height + grow) * k - 1),
+        radius=(radius + grow) * k, fill=255)
+    return mask.resize(size, Image.LANCZOS)
+
+
+def _round_corners(im, width, height, radius, background, ring):
+    # The image cut to a rounded rectangle. Without a background the
+    # corners become transparent (a PNG); with one they are painted in
+    # what is drawn behind the image, so the result stays an opaque JPEG:
+    # background is a colour or a (top, bottom) pair for corners over two
+    # different fills, and ring is an optional (width, colour) border
+    # that shows between the image and its background.
+    mask = _rounded_mask(im.size, width, height, radius)
+    if im.mode == "RGBA":
+        mask = ImageChops.multiply(mask, im.getchannel("A"))
+    if background is None:
+        im = im.convert("RGBA")
+        im.putalpha(mask)
+        return im
+
+    top, bottom = background if isinstance(background, (tuple, list)) else (background,) * 2
+    backdrop = Image.new("RGB", im.size, bottom)
+    backdrop.paste(top, (0, 0, im.width, im.height // 2))
+    if ring:
+        ring_width, ring_color = ring
+        backdrop.paste(ring_color, (0, 0) + im.size,
+                       _rounded_mask(im.size, width, height, radius, ring_width))
+    backdrop.paste(im.convert("RGB"), (0, 0), mask)
+    return backdrop
+
+
+def prepare_image(path, width, height, fit="fill", dpi=IMAGE_DPI,
+                  quality=JPEG_QUALITY, radius=0, background=None, ring=None,
+                  lossless=False):
+    # width/height are the drawn size in points. fit="fill" stretches the
+    # whole image into the box (as drawImage does), fit="cover" keeps the
+    # aspect ratio and crops to the visible centre. A radius (points)
+    # rounds the corners in the pixels themselves, see _round_corners, so
+    # the PDF needs no clipping path. lossless keeps every copy a PNG
+    # instead of making opaque ones JPEGs. Returns the path of a cached,
+    # downsampled copy that should be drawn at exactly width x height.
+    px_w = max(1, round(width * dpi / 72))
+    px_h = max(1, round(height * dpi / 72))
+
+    key = f"{file_hash(path)}-{fit}-{px_w}x{px_h}-" + ("lossless" if lossless else f"q{quality}")
+    if radius:
+        key += "-" + hashlib.sha1(repr((radius, background, ring)).encode()).hexdigest()[:12]
+    for ext in (".jpg", ".png"):
+        cached = os.path.join(IMAGE_CACHE_DIR, key + ext)
+        if os.path.exists(cached):
+            return cached
+
+    with Image.open(path) as im:
+        im.load()
+        alpha = _has_alpha(im)
+        im = im.convert("RGBA" if alpha else "RGB")
+
+        if fit == "cover":
+            im = _cover_crop(im, width, height)
+        elif fit != "fill":
+            raise ValueError(f"unknown fit {fit!r}")
+
+        # never upsample: a smaller source is only re-encoded
+        if im.width > px_w or im.height > px_h:
+            im = im.resize((min(px_w, im.width), min(px_h, im.height)),
+                           Image.LANCZOS)
+        if radius:
+            im = _round_corners(im, width, height, radius, background, ring)
+            alpha = im.mode == "RGBA"
+        png = alpha or lossless
+
+        os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+        cached = os.path.join(IMAGE_CACHE_DIR, key + (".png" if png else ".jpg"))
+        # write under a temporary name so a concurrent worker never reads a
+        # half-written file
+        tmp = f"{cached}.{os.getpid()}.tmp"
+        if png:
+            im.save(tmp, "PNG", optimize=True)
+        else:
+            im.save(tmp, "JPEG", quality=quality, optimize=True)
+        os.replace(tmp, cached)
+    return cached
+
+
+# ---------- REGISTRY ----------
+class ImageRegistry:
+    # document-scoped: every image file is opened, decoded and sized once,
+    # and embedded as one XObject however many times it is drawn
+    def __init__(self):
+        self._readers = {}
+        self._xobjects = {}
+        self.stats = {}
+
+    def _stat(self, path):
+        stats = self.stats.get(path)
+        if stats is None:
+            stats = self.stats[path] = {
+                "source": path, "decodes": 0, "draws": 0, "bytes": 0}
+        return stats
+
+    def reader(self, path):
+        reader = self._readers.get(path)
+        if reader is None:
+            reader = self._readers[path] = ImageReader(path)
+            reader.getSize()
+            reader.getRGBData()
+            self._stat(path)["decodes"] += 1
+        return reader
+
+    def draw(self, canvas, path, x, y, width, height, source=None):
+        # source names the original file when path is a prepared copy
+        stats = self._stat(path)
+        stats["draws"] += 1
+        if source:
+            stats["source"] = source
+
+        name = self._xobjects.get(path)
+        if name is None:
+            found = {"name": None, "imgObj": None, "smask": None}
+            canvas.drawImage(self.reader(path), x, y, width=width,
+                             height=height, mask="auto", extraReturn=found)
+            self._xobjects[path] = found["name"]
+            stats["bytes"] = sum(
+                len(getattr(obj, "streamContent", b""))
+                for obj in (found["imgObj"], found["smask"]))
+            return
+
+        # already embedded: place the existing XObject, which is what
+        # drawImage does minus re-hashing the pixel data
+        canvas.saveState()
+        canvas.translate(x, y)
+        canvas.scale(width, height)
+        canvas.doForm(name)
+        canvas.restoreState()
+
+    def report(self):
+        lines = []
+        for stats in sorted(self.stats.values(), key=lambda s: s["source"]):
+            lines.append(
+                f"{os.path.basename(stats['source']):<24} decodes={stats['decodes']} "
+                f"draws={stats['draws']} bytes={stats['bytes']}")
+        return "\n".join(lines)
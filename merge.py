@@ -0,0 +1,197 @@
+import argparse
+import io
+import os
+import sys
+
+from pypdf import PdfReader
+from pypdf.generic import (ArrayObject, DictionaryObject, FloatObject,
+                           NameObject, NumberObject, TextStringObject)
+
+import Portfolio
+from pdfstream import StreamingWriter, iter_pages
+from trial import A4_WIDTH, INPUT_PDF, scale_page
+
+OUTPUT_PDF = "Amritha_Portfolio_with_case_studies.pdf"
+
+# which destination parameters are x and which are y, by destination type
+_DEST_AXES = {
+    "/XYZ": "xy-", "/FitH": "y", "/FitBH": "y", "/FitV": "x", "/FitBV": "x",
+    "/FitR": "xyxy",
+}
+
+
+# ---------- DESTINATIONS ----------
+def _page_key(ref):
+    return (ref.idnum, ref.generation)
+
+
+def _scaled_dest(dest, transforms):
+    # An explicit destination [page /XYZ left top zoom] moved into the
+    # coordinates of its page after scaling; transforms maps each scaled
+    # source page to (scale, x0, y0)
+    dest = ArrayObject(dest)
+    if not dest or not hasattr(dest[0], "idnum") or _page_key(dest[0]) not in transforms:
+        return dest
+    scale, x0, y0 = transforms[_page_key(dest[0])]
+    for i, axis in enumerate(_DEST_AXES.get(dest[1], "") if len(dest) > 1 else "", 2):
+        if i < len(dest) and axis in "xy" and isinstance(dest[i], (int, float)):
+            dest[i] = FloatObject(round((float(dest[i]) - (x0 if axis == "x" else y0)) * scale, 6))
+    return dest
+
+
+def _fix_links(page, prefix, transforms):
+    # Named destinations get the source's prefix so two inputs can use the
+    # same name; explicit ones follow their page's scaling.
+    for annot in page.get("/Annots") or []:
+        annot = annot.get_object()
+        action = annot.get("/A")
+        if action is not None:
+            action = action.get_object()
+        for holder, key in ((annot, "/Dest"), (action, "/D")):
+            if holder is None or key not in holder:
+                continue
+            dest = holder[key]
+            if isinstance(dest, str):
+                holder[NameObject(key)] = TextStringObject(prefix + dest)
+            elif isinstance(dest, ArrayObject):
+                holder[NameObject(key)] = _scaled_dest(dest, transforms)
+
+
+# ---------- OUTLINES ----------
+def _outline_entries(items, transforms):
+    # pypdf's nested outline list -> [(title, dest, children)]
+    entries = []
+    for item in items:
+        if isinstance(item, list):
+            if entries:
+                entries[-1][2].extend(_outline_entries(item, transforms))
+            continue
+        entries.append((item.title, _scaled_dest(item.dest_array, transforms), []))
+    return entries
+
+
+def _write_outline(writer, entries, parent):
+    # writes one level of outline items under parent; returns first, last
+    # and the number of visible descendants
+    refs = [writer.reserve() for _ in entries]
+    count = 0
+    for i, (title, dest, children) in enumerate(entries):
+        item = DictionaryObject({
+            NameObject("/Title"): TextStringObject(title),
+            NameObject("/Parent"): parent,
+            NameObject("/Dest"): writer.copy(dest),
+        })
+        if i > 0:
+            item[NameObject("/Prev")] = refs[i - 1]
+        if i < len(refs) - 1:
+            item[NameObject("/Next")] = refs[i + 1]
+        if children:
+            first, last, below = _write_outline(writer, children, refs[i])
+            item.update({
+                NameObject("/First"): first,
+                NameObject("/Last"): last,
+                NameObject("/Count"): NumberObject(below),
+            })
+            count += below
+        writer.add_object(item, refs[i])
+        count += 1
+    return refs[0], refs[-1], count
+
+
+# ---------- MERGING ----------
+def merge_pdfs(sources, output_pdf):
+    # sources: (title, file) pairs, a file being a path or a binary file
+    # object. Pages that aren't A4 wide already (to the point; ReportLab's
+    # A4 is 595.28) are scaled to A4 width the same way trial.py does.
+    # Each source becomes a top-level bookmark with its own bookmarks
+    # below it. Returns the writer's saved counts.
+    tmp = f"{output_pdf}.{os.getpid()}.tmp"
+    outline = []
+    names = []
+    with open(tmp, "wb") as f:
+        writer = StreamingWriter(f, dedupe=True)
+        for index, (title, source) in enumerate(sources):
+            reader = PdfReader(source)
+            prefix = f"{index}:"
+
+            # scaling is worked out for every page first, links can point
+            # forward
+            transforms = {}
+            for page in iter_pages(reader):
+                box = page.mediabox
+                if abs(float(box.width) - A4_WIDTH) >= 1:
+                    transforms[_page_key(page.indirect_reference)] = (
+                        A4_WIDTH / float(box.width), float(box.left), float(box.bottom))
+
+            first = None
+            for page in iter_pages(reader):
+                _fix_links(page, prefix, transforms)
+                transform = transforms.get(_page_key(page.indirect_reference))
+                if transform:
+                    scale_page(writer, page, transform[0])
+                ref = writer.add_page(page)
+                first = first or ref
+
+            if first is None:
+                continue
+            outline.append((title, ArrayObject([first, NameObject("/Fit")]),
+                            _outline_entries(reader.outline, transforms)))
+            for name, dest in reader.named_destinations.items():
+                names.append((prefix + name,
+                              writer.copy(_scaled_dest(dest.dest_array, transforms))))
+
+        catalog = {}
+        if outline:
+            root = writer.reserve()
+            first, last, count = _write_outline(writer, outline, root)
+            writer.add_object(DictionaryObject({
+                NameObject("/Type"): NameObject("/Outlines"),
+                NameObject("/First"): first,
+                NameObject("/Last"): last,
+                NameObject("/Count"): NumberObject(count),
+            }), root)
+            catalog[NameObject("/Outlines")] = root
+            catalog[NameObject("/PageMode")] = NameObject("/UseOutlines")
+        if names:
+            # a single-leaf name tree; names must be sorted
+            flat = ArrayObject()
+            for name, dest in sorted(names):
+                flat += [TextStringObject(name), dest]
+            catalog[NameObject("/Names")] = DictionaryObject({
+                NameObject("/Dests"): DictionaryObject({NameObject("/Names"): flat}),
+            })
+        writer.close(catalog)
+    os.replace(tmp, output_pdf)
+    return writer.saved
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the portfolio and append case-study PDFs to it, "
+                    "storing resources they share once.")
+    parser.add_argument("case_studies", nargs="*",
+                        help="PDFs to append (default: Homepage_case_study.pdf)")
+    parser.add_argument("--data", help="JSON file with the portfolio data")
+    parser.add_argument("-o", "--output", default=OUTPUT_PDF)
+    args = parser.parse_args()
+
+    portfolio = io.BytesIO()
+    Portfolio.build_portfolio(Portfolio.load_data(args.data), portfolio)
+    portfolio.seek(0)
+
+    sources = [("Portfolio", portfolio)]
+    for path in args.case_studies or [INPUT_PDF]:
+        sources.append((os.path.splitext(os.path.basename(path))[0], path))
+    saved = merge_pdfs(sources, args.output)
+
+    print(f"Merged {len(sources)} files into {args.output} "
+          f"({os.path.getsize(args.output):,} bytes)")
+    for kind, (streams, size) in sorted(saved.items()):
+        print(f"  {kind:>8}: {streams} duplicate streams, {size:,} bytes saved")
+    if not saved:
+        print("  no duplicate streams")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
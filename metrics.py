@@ -0,0 +1,96 @@
+from functools import lru_cache
+
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfbase.ttfonts import TTFont
+
+try:
+    import numpy as np
+except ImportError:  # bulk measuring falls back to one call per string
+    np = None
+
+# distinct (word, font) pairs kept; plenty for a roster sharing a vocabulary
+WORD_CACHE_SIZE = 65536
+
+
+# ---------- WORD WIDTHS ----------
+@lru_cache(maxsize=WORD_CACHE_SIZE)
+def word_units(word, font):
+    # width in 1/1000 em. Glyph advances are whole units, so sums of these
+    # are exact and scale to any size the same way stringWidth does.
+    return stringWidth(word, font, 1000)
+
+
+# ---------- WRAPPING ----------
+def wrap_lines(text, font, size, max_width):
+    # Greedy wrap that reproduces the original loop exactly: each line keeps
+    # its trailing space and a first word wider than max_width yields an
+    # empty line before it. Every word is measured once (and cached), the
+    # running total stands in for re-measuring the growing line.
+    words = text.split()
+    space = word_units(" ", font)
+    lines = []
+    start = 0
+    line_units = 0
+
+    for i, word in enumerate(words):
+        units = word_units(word, font) + space
+        if 0.001 * size * (line_units + units) <= max_width:
+            line_units += units
+        else:
+            lines.append(" ".join(words[start:i]) + " " if i > start else "")
+            start = i
+            line_units = units
+
+    if words:
+        lines.append(" ".join(words[start:]) + " ")
+    return lines
+
+
+# ---------- BULK MEASURING ----------
+_advance_tables = {}
+
+
+def advance_table(font):
+    # Advance widths of a registered TTFont indexed by code point, built
+    # once per font. Code points the font has no glyph for get the face's
+    # defaultWidth, the same fallback stringWidth uses.
+    table = _advance_tables.get(font)
+    if table is None:
+        face = pdfmetrics.getFont(font).face
+        widths = face.charWidths
+        table = np.full(max(widths) + 1, face.defaultWidth, dtype=np.int64)
+        table[np.fromiter(widths.keys(), dtype=np.int64, count=len(widths))] = \
+            np.fromiter(widths.values(), dtype=np.int64, count=len(widths))
+        _advance_tables[font] = table
+    return table
+
+
+def measure(strings, font, size):
+    # Widths of many strings in one vectorized pass; matches
+    # stringWidth(s, font, size) exactly for every s. Only TrueType fonts
+    # have per-code-point advances; Type1 faces measure one string at a time.
+    if np is None or not isinstance(pdfmetrics.getFont(font), TTFont):
+        return [stringWidth(s, font, size) for s in strings]
+
+    strings = list(strings)
+    table = advance_table(font)
+    default = pdfmetrics.getFont(font).face.defaultWidth
+
+    codes = np.frombuffer("".join(strings).encode("utf-32-le"), dtype=np.uint32)
+    units = np.where(codes < len(table),
+                     table[np.minimum(codes, len(table) - 1)], default)
+
+    # per-string sums from one prefix sum over the concatenated code points
+    lengths = np.fromiter(map(len, strings), dtype=np.int64, count=len(strings))
+    ends = np.cumsum(lengths)
+    prefix = np.concatenate(([0], np.cumsum(units)))
+    # plain floats: numpy scalars reach the PDF through str(), not
+    # ReportLab's number formatting
+    return (0.001 * size * (prefix[ends] - prefix[ends - lengths])).tolist()
+
+
+def reset():
+    # forget cached metrics, e.g. after fonts were re-registered
+    word_units.cache_clear()
+    _advance_tables.clear()
@@ -0,0 +1,79 @@
+import hashlib
+import os
+
+from image_cache import CACHE_DIR
+
+OUTPUT_CACHE_DIR = os.path.join(CACHE_DIR, "output")
+# finished PDFs kept, by total size; the least recently used go first
+OUTPUT_CACHE_BYTES = 512 * 1024 * 1024
+
+
+class OutputCache:
+    # Finished PDFs on disk under the hash of everything that went into
+    # them, as <key>.pdf next to <key>.sha256 holding the digest of the PDF.
+    # A PDF whose bytes no longer match its digest is thrown away, not
+    # served. A hit touches the file, so mtime order is LRU order; every
+    # file is written to a temporary name first, so several processes can
+    # share one directory.
+    def __init__(self, directory=OUTPUT_CACHE_DIR, max_bytes=OUTPUT_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.corrupt = 0
+
+    def _path(self, key, ext):
+        return os.path.join(self.directory, key + ext)
+
+    def get(self, key):
+        # the cached PDF's bytes, or None
+        try:
+            with open(self._path(key, ".pdf"), "rb") as f:
+                pdf = f.read()
+            with open(self._path(key, ".sha256")) as f:
+                digest = f.read().strip()
+        except OSError:
+            self.misses += 1
+            return None
+        if hashlib.sha256(pdf).hexdigest() != digest:
+            self.corrupt += 1
+            self.misses += 1
+            self._remove(key)
+            return None
+        os.utime(self._path(key, ".pdf"))
+        self.hits += 1
+        return pdf
+
+    def put(self, key, pdf):
+        os.makedirs(self.directory, exist_ok=True)
+        # the digest goes in last: a PDF without one is never served
+        for ext, content in ((".pdf", pdf),
+                             (".sha256", hashlib.sha256(pdf).hexdigest().encode())):
+            path = self._path(key, ext)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(content)
+            os.replace(tmp, path)
+        self.evict()
+
+    def _remove(self, key):
+        for ext in (".pdf", ".sha256"):
+            try:
+                os.remove(self._path(key, ext))
+            except FileNotFoundError:
+                pass
+
+    def evict(self):
+        # drops the least recently used PDFs until the rest fit in max_bytes
+        try:
+            with os.scandir(self.directory) as entries:
+                files = [(e.stat().st_mtime_ns, e.stat().st_size, e.name[:-4])
+                         for e in entries if e.name.endswith(".pdf")]
+        except FileNotFoundError:
+            return
+        total = sum(size for _, size, _ in files)
+        for _, size, key in sorted(files):
+            if total <= self.max_bytes:
+                break
+            self._remove(key)
+            total -= size
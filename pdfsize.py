@@ -0,0 +1,375 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import zlib
+from io import BytesIO
+
+from PIL import Image
+from pypdf import PdfReader
+from pypdf.filters import ASCII85Decode, ASCIIHexDecode
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+from image_cache import IMAGE_CACHE_DIR, file_hash
+from pdfstream import stream_kind
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+IMG_DIR = os.path.join(BASE_DIR, "images")
+
+# streams smaller than this aren't worth flagging
+MIN_FLAG_BYTES = 1024
+# a stream is badly compressed when zlib at level 9 would make its
+# stored bytes at least this much smaller
+RECOMPRESS_GAIN = 0.2
+# filters that make stored bytes bigger, not smaller
+_TEXT_FILTERS = ("/ASCII85Decode", "/ASCIIHexDecode")
+
+
+# ---------- OBJECT SIZES ----------
+def object_sizes(reader):
+    # bytes each indirect object takes in the file, from the distance
+    # between xref offsets; an object stream's bytes are shared among the
+    # objects packed into it, in proportion to their serialized size
+    offsets = sorted(
+        (offset, idnum) for gen in reader.xref.values()
+        for idnum, offset in gen.items() if offset)
+    # the last object runs up to the xref table (or stream) at startxref
+    ends = [offset for offset, _ in offsets[1:]] + [reader._startxref]
+    sizes = {idnum: end - offset for (offset, idnum), end in zip(offsets, ends)}
+    packed = {}
+    for idnum, (container, _) in reader.xref_objStm.items():
+        packed.setdefault(container, {})[idnum] = len(_serialize(reader.get_object(idnum)))
+    for container, members in packed.items():
+        stored = sizes.pop(container, 0)
+        serialized = sum(members.values()) or 1
+        for idnum, size in members.items():
+            sizes[idnum] = stored * size / serialized
+    return sizes
+
+
+def _serialize(obj):
+    out = BytesIO()
+    obj.write_to_stream(out)
+    return out.getvalue()
+
+
+def _filters(stream):
+    filters = stream.get("/Filter")
+    if filters is None:
+        return []
+    return [str(f) for f in (filters if isinstance(filters, ArrayObject) else [filters])]
+
+
+# ---------- IMAGE SOURCES ----------
+class _ImageSources:
+    # Finds the file in images/ an embedded image was made from. JPEGs are
+    # embedded as they are, so their bytes match the cached copy (or the
+    # original); PNGs, cached copies and originals alike, are stored as
+    # decoded pixels and matched by those. Cached copies are named after
+    # the hash of their source file.
+    def __init__(self, img_dir=IMG_DIR, cache_dir=IMAGE_CACHE_DIR):
+        self.sources = {}
+        self._by_digest = {}
+        self._pending_png = []
+        for directory in (img_dir, cache_dir):
+            if not os.path.isdir(directory):
+                continue
+            for name in sorted(os.listdir(directory)):
+                path = os.path.join(directory, name)
+                if name.startswith(".") or not os.path.isfile(path):
+                    continue
+                if directory == img_dir:
+                    source = file_hash(path)
+                    self.sources[source] = path
+                    self._by_digest[_sha1_file(path)] = (source, None)
+                    if name.lower().endswith(".png"):
+                        self._pending_png.append((path, (source, None)))
+                elif name.endswith(".jpg"):
+                    self._by_digest[_sha1_file(path)] = (name.split("-")[0], path)
+                elif name.endswith(".png"):
+                    self._pending_png.append((path, (name.split("-")[0], path)))
+
+    def _resolve(self, found):
+        source, cached = found
+        return {"source": self.sources.get(source, source), "cached_copy": cached}
+
+    def find(self, image):
+        if "/DCTDecode" in _filters(image):
+            found = self._by_digest.get(hashlib.sha1(image.get_data()).hexdigest())
+            return self._resolve(found) if found else None
+
+        # pixels: only decode PNGs of the right size
+        size = (int(image["/Width"]), int(image["/Height"]))
+        digest = hashlib.sha1(image.get_data()).hexdigest()
+        for pending in list(self._pending_png):
+            path, found = pending
+            with Image.open(path) as im:
+                if im.size != size:
+                    continue
+                pixels = im.convert("RGB").tobytes()
+            self._pending_png.remove(pending)
+            self._by_digest.setdefault(hashlib.sha1(pixels).hexdigest(), found)
+        found = self._by_digest.get(digest)
+        return self._resolve(found) if found else None
+
+
+def _sha1_file(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+# ---------- ATTRIBUTION ----------
+def _refs(obj):
+    # indirect references directly inside obj (not through other objects)
+    if isinstance(obj, IndirectObject):
+        yield obj
+    elif isinstance(obj, (DictionaryObject, StreamObject)):
+        for key, value in obj.items():
+            if key != "/Parent":
+                yield from _refs(value)
+    elif isinstance(obj, ArrayObject):
+        for value in obj:
+            yield from _refs(value)
+
+
+class _Owners:
+    # assigns every object to the first bucket that claims it, following
+    # references from the claimed object (but not into pages)
+    def __init__(self, reader):
+        self.reader = reader
+        self.owner = {}
+
+    def claim(self, ref, bucket, stop=()):
+        todo = [ref]
+        while todo:
+            ref = todo.pop()
+            if not isinstance(ref, IndirectObject) or ref.idnum in self.owner:
+                continue
+            obj = ref.get_object()
+            if isinstance(obj, DictionaryObject) and obj.get("/Type") in ("/Page", "/Pages"):
+                continue
+            if ref.idnum in stop:
+                continue
+            self.owner[ref.idnum] = bucket
+            todo.extend(_refs(obj))
+
+
+def _resource_items(resources, kind):
+    resources = resources.get_object() if resources is not None else None
+    if not isinstance(resources, DictionaryObject) or kind not in resources:
+        return []
+    return list(resources[kind].get_object().items())
+
+
+def analyze(path, img_dir=IMG_DIR, cache_dir=IMAGE_CACHE_DIR):
+    total = os.path.getsize(path)
+    with open(path, "rb") as f:
+        reader = PdfReader(f)
+        sizes = object_sizes(reader)
+        owners = _Owners(reader)
+        sources = _ImageSources(img_dir, cache_dir)
+        details = {}
+
+        # images, forms and fonts first: they are shared between pages.
+        # Images and forms are told apart by object, not by resource name:
+        # pages (and PIL, which calls every image /image) reuse names for
+        # different objects.
+        def visit_resources(resources):
+            for name, ref in _resource_items(resources, "/XObject"):
+                xobject = ref.get_object()
+                number = ref.idnum if isinstance(ref, IndirectObject) else name
+                if xobject.get("/Subtype") == "/Image":
+                    bucket = f"image {number}"
+                    if bucket not in details:
+                        details[bucket] = {
+                            "kind": "image", "name": name, "object": number,
+                            "pixels": [int(xobject["/Width"]), int(xobject["/Height"])],
+                            "filters": _filters(xobject),
+                            **(sources.find(xobject) or {"source": None}),
+                        }
+                    owners.claim(ref, bucket)
+                else:
+                    bucket = f"form {number}"
+                    if bucket in details:
+                        continue  # its resources are visited already
+                    details[bucket] = {"kind": "form", "name": name, "object": number}
+                    visit_resources(xobject.get("/Resources"))
+                    owners.claim(ref, bucket)
+            for name, ref in _resource_items(resources, "/Font"):
+                font = ref.get_object()
+                base = str(font.get("/BaseFont", name)).lstrip("/")
+                # subsets are ABCDEF+Name; all subsets of a font count together
+                family = base.split("+", 1)[-1]
+                bucket = f"font {family}"
+                details.setdefault(bucket, {"kind": "font", "name": family, "subsets": 0})
+                if isinstance(ref, IndirectObject) and ref.idnum not in owners.owner:
+                    details[bucket]["subsets"] += 1
+                owners.claim(ref, bucket)
+
+        pages = list(reader.pages)
+        for page in pages:
+            visit_resources(page.get("/Resources"))
+
+        for number, page in enumerate(pages, 1):
+            bucket = f"page {number}"
+            details[bucket] = {"kind": "page", "name": str(number)}
+            for annot in page.get("/Annots") or []:
+                owners.claim(annot, f"annotations {number}")
+                details.setdefault(f"annotations {number}",
+                                   {"kind": "annotations", "name": str(number), "count": 0})
+                details[f"annotations {number}"]["count"] += 1
+            contents = page.raw_get("/Contents") if "/Contents" in page else None
+            if isinstance(contents, IndirectObject):
+                owners.claim(contents, bucket)
+            elif isinstance(contents, ArrayObject):
+                for ref in contents:
+                    owners.claim(ref, bucket)
+            owners.owner.setdefault(page.indirect_reference.idnum, bucket)
+            owners.claim(page.raw_get("/Resources") if "/Resources" in page else None, bucket)
+
+        buckets = {}
+        for idnum, size in sizes.items():
+            bucket = owners.owner.get(idnum, "document")
+            details.setdefault(bucket, {"kind": "document", "name": "catalog, page tree, info"})
+            buckets[bucket] = buckets.get(bucket, 0) + size
+        buckets = {bucket: round(size) for bucket, size in buckets.items()}
+        xref = total - sum(buckets.values())
+        buckets["xref and trailer"] = xref
+        details["xref and trailer"] = {"kind": "overhead", "name": "xref and trailer"}
+
+        duplicates, badly_compressed = _stream_flags(reader, sizes, owners.owner)
+
+    entries = [dict(details[bucket], bucket=bucket, bytes=size)
+               for bucket, size in sorted(buckets.items(), key=lambda item: -item[1])]
+    by_kind = {}
+    for entry in entries:
+        by_kind[entry["kind"]] = by_kind.get(entry["kind"], 0) + entry["bytes"]
+    return {
+        "file": path,
+        "bytes": total,
+        "pages": len(pages),
+        "by_kind": dict(sorted(by_kind.items(), key=lambda item: -item[1])),
+        "entries": entries,
+        "duplicate_streams": duplicates,
+        "badly_compressed": badly_compressed,
+    }
+
+
+def _stream_flags(reader, sizes, owner):
+    # streams stored more than once, and streams whose stored bytes could
+    # be a good deal smaller: text encodings (ASCII85 grows data by a
+    # quarter) and data zlib would shrink further
+    seen = {}
+    duplicates = []
+    badly = []
+    for idnum in sorted(sizes):
+        obj = reader.get_object(idnum)
+        if not isinstance(obj, StreamObject):
+            continue
+        raw = obj._data
+        digest = hashlib.sha1(raw).hexdigest()
+        if digest in seen:
+            duplicates.append({"object": idnum, "same_as": seen[digest], "kind": stream_kind(obj),
+                               "bucket": owner.get(idnum, "document"), "bytes": len(raw)})
+        else:
+            seen[digest] = idnum
+        if len(raw) < MIN_FLAG_BYTES:
+            continue
+
+        filters = _filters(obj)
+        try:
+            data = obj.get_data()
+        except Exception:
+            continue
+        # what the stream would take without text encodings, with anything
+        # not already compressed (JPEG and friends are) deflated at level 9
+        if set(filters) & {"/DCTDecode", "/JPXDecode", "/CCITTFaxDecode", "/JBIG2Decode"}:
+            best = len(_strip_text_filters(obj, filters))
+        else:
+            best = min(len(zlib.compress(data, 9)), len(raw))
+        gain = len(raw) - best
+        encoded = [f for f in filters if f in _TEXT_FILTERS]
+        if encoded:
+            # always worth fixing: ASCII85 alone adds a quarter
+            reasons = [f"text-encoded ({', '.join(encoded)})"]
+        elif not filters and gain >= len(raw) * RECOMPRESS_GAIN:
+            reasons = ["not compressed"]
+        elif "/FlateDecode" in filters and gain >= len(raw) * RECOMPRESS_GAIN:
+            reasons = ["weak deflate"]
+        else:
+            continue
+        badly.append({"object": idnum, "bucket": owner.get(idnum, "document"),
+                      "filters": filters, "bytes": len(raw), "could_be": best,
+                      "reasons": reasons})
+    return duplicates, badly
+
+
+def _strip_text_filters(stream, filters):
+    # the stream's bytes with the leading ASCII85/hex encodings undone
+    data = stream._data
+    for name in filters:
+        if name == "/ASCII85Decode":
+            data = ASCII85Decode.decode(data)
+        elif name == "/ASCIIHexDecode":
+            data = ASCIIHexDecode.decode(data)
+        else:
+            break
+    return data
+
+
+# ---------- REPORT ----------
+def _label(entry):
+    # images and forms are bucketed by object number; show their name too
+    if entry["kind"] in ("image", "form"):
+        return f"{entry['kind']} {entry['name']} (object {entry['object']})"
+    return entry["bucket"]
+
+
+def summary(report, top=15):
+    total = report["bytes"]
+    lines = [f"{report['file']}: {total:,} bytes, {report['pages']} pages"]
+    for kind, size in report["by_kind"].items():
+        lines.append(f"  {kind:<12} {size:>11,}  {size / total:6.1%}")
+    lines.append("  largest:")
+    for entry in report["entries"][:top]:
+        label = _label(entry)
+        if entry.get("source"):
+            label += f"  <- {os.path.basename(entry['source'])}"
+        lines.append(f"    {entry['bytes']:>11,}  {label}")
+    if report["duplicate_streams"]:
+        wasted = sum(d["bytes"] for d in report["duplicate_streams"])
+        lines.append(f"  {len(report['duplicate_streams'])} duplicate streams, "
+                     f"{wasted:,} bytes stored twice")
+    if report["badly_compressed"]:
+        saving = sum(b["bytes"] - b["could_be"] for b in report["badly_compressed"])
+        lines.append(f"  {len(report['badly_compressed'])} badly compressed streams, "
+                     f"about {saving:,} bytes to gain:")
+        labels = {entry["bucket"]: _label(entry) for entry in report["entries"]}
+        for item in sorted(report["badly_compressed"], key=lambda b: b["could_be"] - b["bytes"])[:top]:
+            lines.append(f"    object {item['object']:>5} ({labels.get(item['bucket'], item['bucket'])}): "
+                         f"{item['bytes']:,} -> {item['could_be']:,}, {'; '.join(item['reasons'])}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Break a PDF's size down by image, font, page, annotation "
+                    "and stream, and flag duplicate or badly compressed streams.")
+    parser.add_argument("pdfs", nargs="+", help="PDF files to analyze")
+    parser.add_argument("--json", action="store_true", help="print the reports as JSON")
+    parser.add_argument("--top", type=int, default=15,
+                        help="largest entries listed in the summary (default 15)")
+    args = parser.parse_args()
+
+    reports = [analyze(path) for path in args.pdfs]
+    if args.json:
+        json.dump(reports, sys.stdout, indent=2)
+        print()
+    else:
+        print("\n\n".join(summary(report, args.top) for report in reports))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,338 @@
+import hashlib
+import struct
+import zlib
+from io import BytesIO
+
+from pypdf import PageObject, PdfReader
+from pypdf.filters import ASCII85Decode, ASCIIHexDecode
+from pypdf.generic import (ArrayObject, DictionaryObject, EncodedStreamObject,
+                           IndirectObject, NameObject, NullObject, NumberObject,
+                           StreamObject)
+
+# The page being copied is written out as soon as its objects are reached,
+# so memory holds the object numbers and file offsets, not the objects.
+# Nothing here parses content streams: stream bytes go out exactly as
+# they were read, still compressed (recompress only re-encodes them).
+
+# page attributes a page can take from its ancestors in the page tree
+_INHERITED = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+# filters that only turn binary into text; recompress takes them off
+_TEXT_FILTERS = {"/ASCII85Decode": ASCII85Decode, "/ASCIIHexDecode": ASCIIHexDecode}
+# objects packed into each object stream
+OBJECTS_PER_STREAM = 100
+
+
+def iter_pages(reader):
+    # Pages in order, like reader.pages but without building (and keeping)
+    # a flattened copy of every page up front. Each page gets the inherited
+    # attributes it doesn't set itself.
+    def walk(ref, inherited):
+        node = ref.get_object()
+        if "/Kids" not in node:
+            page = PageObject(reader, ref)
+            for key, value in inherited.items():
+                if key not in page:
+                    page[NameObject(key)] = value
+            yield page
+            return
+        inherited = dict(inherited, **{k: node.raw_get(k) for k in _INHERITED if k in node})
+        for kid in list(node["/Kids"]):
+            yield from walk(kid, inherited)
+
+    yield from walk(reader.trailer["/Root"].raw_get("/Pages"), {})
+
+
+def stream_kind(stream):
+    # what a stream is for, judged by its own dictionary
+    subtype = stream.get("/Subtype")
+    if subtype == "/Image":
+        return "image"
+    if subtype == "/Form":
+        return "form"
+    if "/Length1" in stream or subtype in ("/Type1C", "/CIDFontType0C", "/OpenType"):
+        return "font"
+    if "/N" in stream:
+        return "icc"
+    return "content"
+
+
+class StreamingWriter:
+    # Writes a PDF to an open binary file one page at a time. Objects are
+    # copied out of source readers with their references renumbered; an
+    # object reached from several pages (a shared font, an image) is
+    # written once. Call close() to write the page tree and xref.
+    #
+    # With dedupe, streams are also matched by content: a stream whose
+    # dictionary and bytes equal one already written (the same image or
+    # font program embedded by two source files) is stored once. saved
+    # counts what that left out, as {kind: [streams, bytes]}.
+    #
+    # recompress takes ASCII85 and hex encodings off streams and deflates
+    # streams stored without a filter. object_streams packs every object
+    # that isn't a stream into compressed object streams and ends the file
+    # with a cross-reference stream instead of a table (PDF 1.5 readers).
+    def __init__(self, stream, dedupe=False, recompress=False, object_streams=False):
+        self.stream = stream
+        self.dedupe = dedupe
+        self.recompress = recompress
+        self.object_streams = object_streams
+        self.saved = {}
+        self._packed = []       # (object number, bytes) for the open object stream
+        self._packed_id = None
+        self._digests = {}      # stream content hash -> object number
+        self._offsets = [None]  # object number -> file offset
+        self._ids = {}          # (source, idnum, generation) -> object number
+        self._pending = []
+        self._reserved_pages = set()
+        self._pages = []
+        self._pages_id = self._allocate()
+        self._write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    def _allocate(self):
+        self._offsets.append(None)
+        return len(self._offsets) - 1
+
+    def _write(self, data):
+        self.stream.write(data)
+
+    def _write_object(self, number, obj):
+        if self.object_streams and not isinstance(obj, (bytes, StreamObject)):
+            self._pack(number, obj)
+            return
+        self._offsets[number] = self.stream.tell()
+        self._write(b"%d 0 obj\n" % number)
+        if isinstance(obj, bytes):
+            self._write(obj)
+        else:
+            obj.write_to_stream(self.stream)
+        self._write(b"\nendobj\n")
+
+    def _pack(self, number, obj):
+        # object streams hold (stream number, index) where the offset goes
+        if self._packed_id is None:
+            self._packed_id = self._allocate()
+        out = BytesIO()
+        obj.write_to_stream(out)
+        self._offsets[number] = (self._packed_id, len(self._packed))
+        self._packed.append((number, out.getvalue()))
+        if len(self._packed) == OBJECTS_PER_STREAM:
+            self._flush_packed()
+
+    def _flush_packed(self):
+        if not self._packed:
+            return
+        header = []
+        body = BytesIO()
+        for number, data in self._packed:
+            header.append(b"%d %d" % (number, body.tell()))
+            body.write(data + b"\n")
+        header = b" ".join(header) + b"\n"
+        data = zlib.compress(header + body.getvalue())
+        self._write_object(self._packed_id, b"<< /Type /ObjStm /N %d /First %d "
+                           b"/Filter /FlateDecode /Length %d >>\nstream\n%s\nendstream"
+                           % (len(self._packed), len(header), len(data), data))
+        self._packed = []
+        self._packed_id = None
+
+    def _ref(self, number):
+        return IndirectObject(number, 0, self)
+
+    def reserve(self):
+        # a reference to fill in later with add_object(obj, ref)
+        return self._ref(self._allocate())
+
+    def add_object(self, obj, ref=None):
+        # a new object, written straight away
+        if self.dedupe and ref is None and isinstance(obj, StreamObject):
+            return self._ref(self._write_stream(obj))
+        ref = ref or self.reserve()
+        self._write_object(ref.idnum, self.copy(obj))
+        return ref
+
+    # ---------- COPYING ----------
+    def _copy_ref(self, ref):
+        if ref.pdf is self:
+            return ref
+        key = (id(ref.pdf), ref.idnum, ref.generation)
+        number = self._ids.get(key)
+        if number is None:
+            obj = ref.get_object() if self.dedupe else None
+            if isinstance(obj, StreamObject):
+                number = self._ids[key] = self._write_stream(obj)
+            else:
+                number = self._ids[key] = self._allocate()
+                self._pending.append((number, ref))
+        return self._ref(number)
+
+    def _write_stream(self, obj):
+        # Streams are copied depth first here so the references in their
+        # dictionaries are already renumbered, and a shared /SMask or
+        # /DecodeParms makes two otherwise equal images hash the same.
+        out = BytesIO()
+        new = self.copy(obj)
+        new.write_to_stream(out)
+        data = out.getvalue()
+        digest = hashlib.sha1(data).digest()
+        number = self._digests.get(digest)
+        if number is not None:
+            saved = self.saved.setdefault(stream_kind(new), [0, 0])
+            saved[0] += 1
+            saved[1] += len(data)
+            return number
+        number = self._digests[digest] = self._allocate()
+        self._write_object(number, data)
+        return number
+
+    def copy(self, obj, skip=()):
+        # obj with every reference into a source document renumbered; the
+        # objects referred to are written out as they are reached
+        if isinstance(obj, IndirectObject):
+            return self._copy_ref(obj)
+        if isinstance(obj, StreamObject):
+            new = type(obj)()
+            new._data = obj._data
+            skip = ("/Length",)
+            recompressed = self._recompressed(obj) if self.recompress else None
+            if recompressed:
+                new = EncodedStreamObject()
+                new._data, filters, parms = recompressed
+                if filters:
+                    new[NameObject("/Filter")] = filters
+                if parms:
+                    new[NameObject("/DecodeParms")] = self.copy(parms)
+                skip = ("/Length", "/Filter", "/DecodeParms")
+        elif isinstance(obj, DictionaryObject):
+            new = DictionaryObject()
+        elif isinstance(obj, ArrayObject):
+            return ArrayObject(self.copy(v) for v in obj)
+        else:
+            return obj
+        for key, value in obj.items():
+            if key not in skip:
+                new[NameObject(key)] = self.copy(value)
+        return new
+
+    def _recompressed(self, obj):
+        # (data, /Filter, /DecodeParms) for obj without text encodings and
+        # deflated if it had no other filter; None when nothing changes
+        filters = obj.get("/Filter")
+        filters = list(filters) if isinstance(filters, ArrayObject) else [filters] if filters else []
+        parms = obj.get("/DecodeParms")
+        parms = list(parms) if isinstance(parms, ArrayObject) else [parms] * len(filters)
+        if filters and filters[0] not in _TEXT_FILTERS:
+            return None
+
+        data = obj._data
+        while filters and filters[0] in _TEXT_FILTERS:
+            data = _TEXT_FILTERS[filters.pop(0)].decode(data)
+            parms.pop(0)
+        if not filters:
+            deflated = zlib.compress(data, 9)
+            if len(deflated) < len(data):
+                data, filters, parms = deflated, ["/FlateDecode"], [None]
+            elif data is obj._data:
+                return None
+
+        names = [NameObject(f) for f in filters]
+        if not any(p is not None for p in parms):
+            parms = None
+        elif len(parms) == 1:
+            parms = parms[0]
+        else:
+            parms = ArrayObject(NullObject() if p is None else p for p in parms)
+        return data, (names[0] if len(names) == 1 else ArrayObject(names) if names else None), parms
+
+    def _drain(self):
+        while self._pending:
+            number, ref = self._pending.pop()
+            obj = ref.get_object()
+            if isinstance(obj, DictionaryObject) and obj.get("/Type") == "/Page":
+                # a link to another page; written if that page is added
+                self._reserved_pages.add(number)
+                continue
+            self._write_object(number, self.copy(obj if obj is not None else NullObject()))
+
+    # ---------- PAGES ----------
+    def add_page(self, page):
+        # page comes from reader.pages or iter_pages, which have already
+        # copied in the attributes it inherits from the page tree
+        ref = page.indirect_reference
+        key = (id(ref.pdf), ref.idnum, ref.generation) if ref else None
+        number = self._ids.get(key) if key else None
+        if number is None:
+            number = self._allocate()
+            if key:
+                self._ids[key] = number
+        self._reserved_pages.discard(number)
+
+        new = self.copy(page, skip=("/Parent",))
+        new[NameObject("/Parent")] = self._ref(self._pages_id)
+        self._write_object(number, new)
+        self._pages.append(number)
+        self._drain()
+        return self._ref(number)
+
+    def close(self, catalog=None, info=None):
+        # catalog: extra entries for the document catalog (/Outlines, ...);
+        # info: the document information dictionary (/Title, /Author, ...)
+        # links to pages that were never added point at nothing
+        for number in self._reserved_pages:
+            self._write_object(number, NullObject())
+
+        pages = DictionaryObject({
+            NameObject("/Type"): NameObject("/Pages"),
+            NameObject("/Kids"): ArrayObject(self._ref(n) for n in self._pages),
+            NameObject("/Count"): NumberObject(len(self._pages)),
+        })
+        self._write_object(self._pages_id, pages)
+        root = DictionaryObject(catalog or {})
+        root[NameObject("/Type")] = NameObject("/Catalog")
+        root[NameObject("/Pages")] = self._ref(self._pages_id)
+        root = self.add_object(root)
+        trailer = b"/Root %d 0 R" % root.idnum
+        if info is not None:
+            info = self.copy(info) if isinstance(info, IndirectObject) else self.add_object(info)
+            trailer += b" /Info %d 0 R" % info.idnum
+        self._drain()
+        self._flush_packed()
+
+        xref = self.stream.tell()
+        if self.object_streams:
+            self._write_xref_stream(trailer)
+            return
+        self._write(b"xref\n0 %d\n0000000000 65535 f \n" % len(self._offsets))
+        for offset in self._offsets[1:]:
+            self._write(b"%010d 00000 n \n" % offset)
+        self._write(b"trailer\n<< /Size %d %s >>\nstartxref\n%d\n%%%%EOF\n"
+                    % (len(self._offsets), trailer, xref))
+
+    def _write_xref_stream(self, trailer):
+        # one row per object: type 1 is at a file offset, type 2 is the
+        # index-th object in an object stream
+        number = self._allocate()
+        xref = self._offsets[number] = self.stream.tell()
+        rows = [struct.pack(">BIH", 0, 0, 65535)]
+        for entry in self._offsets[1:]:
+            if isinstance(entry, tuple):
+                rows.append(struct.pack(">BIH", 2, *entry))
+            else:
+                rows.append(struct.pack(">BIH", 1, entry, 0))
+        data = zlib.compress(b"".join(rows))
+        self._write(b"%d 0 obj\n<< /Type /XRef /Size %d /W [1 4 2] %s /Filter /FlateDecode "
+                    b"/Length %d >>\nstream\n%s\nendstream\nendobj\n"
+                    % (number, len(self._offsets), trailer, len(data), data))
+        self._write(b"startxref\n%d\n%%%%EOF\n" % xref)
+
+
+def repack(pdf, recompress=False, object_streams=False):
+    # pdf's bytes written again through a StreamingWriter with these
+    # options, keeping its catalog entries and document information
+    reader = PdfReader(BytesIO(pdf))
+    out = BytesIO()
+    writer = StreamingWriter(out, recompress=recompress, object_streams=object_streams)
+    for page in iter_pages(reader):
+        writer.add_page(page)
+    root = reader.trailer["/Root"].get_object()
+    writer.close({key: value for key, value in root.items() if key not in ("/Type", "/Pages")},
+                 reader.trailer.raw_get("/Info") if "/Info" in reader.trailer else None)
+    return out.getvalue()
@@ -0,0 +1,46 @@
+from image_cache import IMAGE_DPI, JPEG_QUALITY
+
+# Named trade-offs between build time and file size, used by the
+# generator (Portfolio.py, batch.py) and by trial.py alike, except draft:
+# normalizing has no deflating or resampling of its own to skip, so
+# trial.py doesn't offer it.
+#
+#   compress        deflate page content; off saves the time and costs bytes
+#   ascii85         ASCII85-encode binary streams on top, as ReportLab does
+#                   by default: a quarter bigger, but the file stays 7-bit
+#   object_streams  pack everything but streams into object streams and
+#                   end with a cross-reference stream (needs a PDF 1.5 reader)
+#   image_dpi       resolution images are resampled to (generator only)
+#   jpeg_quality    quality of resampled photos (generator only)
+#   lossless        keep resampled images as PNG instead of JPEG (generator only)
+#
+# "standard" is what the generator has always written.
+PROFILES = {
+    "standard": {"compress": True, "ascii85": True, "object_streams": False,
+                 "image_dpi": IMAGE_DPI, "jpeg_quality": JPEG_QUALITY, "lossless": False},
+    "draft": {"compress": False, "ascii85": False, "object_streams": False,
+              "image_dpi": 72, "jpeg_quality": 75, "lossless": False},
+    "web": {"compress": True, "ascii85": False, "object_streams": True,
+            "image_dpi": 150, "jpeg_quality": JPEG_QUALITY, "lossless": False},
+    "print": {"compress": True, "ascii85": False, "object_streams": False,
+              "image_dpi": 300, "jpeg_quality": JPEG_QUALITY, "lossless": True},
+}
+DEFAULT_PROFILE = "standard"
+
+
+def get_profile(name=None):
+    # the settings of a profile by name; None is the default profile
+    try:
+        return PROFILES[name or DEFAULT_PROFILE]
+    except KeyError:
+        raise ValueError(f"unknown output profile {name!r}, "
+                         f"expected one of {', '.join(PROFILES)}") from None
+
+
+def writer_options(profile):
+    # StreamingWriter/repack keyword arguments that finish a PDF the way
+    # profile wants; all False means it is fine as written
+    return {
+        "recompress": profile["compress"] and not profile["ascii85"],
+        "object_streams": profile["object_streams"],
+    }
@@ -0,0 +1,189 @@
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus import Flowable
+
+import Portfolio
+import image_cache
+
+# Opt-in build timeline. Nothing here touches the generator until
+# Profiler.install() wraps the methods below, and uninstall() puts the
+# originals back, so a build that isn't profiled runs exactly the code it
+# always did.
+#
+# Spans nest: a grid's draw contains its cards' draws. The table shows
+# each name's inclusive time and its self time, the part not spent in a
+# nested span; the self time of "build" is ReportLab's own page assembly.
+
+# flowable methods timed on every Flowable subclass that defines them, and
+# the name they show up under; _drawOn is where a cached flowable replays
+# its recording instead of calling draw
+FLOWABLE_METHODS = {"wrap": "wrap", "split": "split", "_drawOn": "draw"}
+
+
+class Profiler:
+    def __init__(self):
+        self.events = []
+        # open spans: [name, category, start ns, ns in nested spans,
+        # same-name spans merged into it]
+        self._stack = []
+        self._patched = []
+        self._origin = None
+
+    # ---------- SPANS ----------
+    def begin(self, name, category):
+        # a span inside one of the same name (an override calling super())
+        # is part of it, not a second call
+        if self._stack and self._stack[-1][0] == name:
+            self._stack[-1][4] += 1
+            return
+        now = time.perf_counter_ns()
+        if self._origin is None:
+            self._origin = now
+        self._stack.append([name, category, now, 0, 0])
+
+    def end(self):
+        if self._stack[-1][4]:
+            self._stack[-1][4] -= 1
+            return
+        name, category, start, nested, _ = self._stack.pop()
+        duration = time.perf_counter_ns() - start
+        if self._stack:
+            self._stack[-1][3] += duration
+        self.events.append((name, category, start - self._origin, duration,
+                            duration - nested))
+
+    @contextmanager
+    def span(self, name, category="build"):
+        self.begin(name, category)
+        try:
+            yield
+        finally:
+            self.end()
+
+    def _timed(self, method, category, label):
+        profiler = self
+
+        def timed(*args, **kwargs):
+            profiler.begin(label(args), category)
+            try:
+                return method(*args, **kwargs)
+            finally:
+                profiler.end()
+        timed.__wrapped__ = method
+        return timed
+
+    # ---------- PATCHING ----------
+    def _patch(self, owner, name, category, label):
+        original = owner.__dict__[name]
+        self._patched.append((owner, name, original))
+        setattr(owner, name, self._timed(original, category, label))
+
+    def install(self):
+        # every Flowable subclass loaded so far, ReportLab's included;
+        # only methods a class defines itself, so nothing is timed twice
+        classes = [Flowable]
+        for cls in classes:
+            classes.extend(cls.__subclasses__())
+        for cls in dict.fromkeys(classes):
+            for method, shown in FLOWABLE_METHODS.items():
+                if method in cls.__dict__:
+                    self._patch(cls, method, "flowable", lambda args, shown=shown:
+                                f"{type(args[0]).__name__}.{shown}")
+
+        self._patch(Portfolio, "build_story", "build", lambda args: "build_story")
+        for name in ("draw_first_page", "draw_header"):
+            self._patch(Portfolio, name, "onPage", lambda args, n=name: n)
+        self._patch(Portfolio, "prepare_image", "image", lambda args: "prepare_image")
+        self._patch(image_cache.ImageRegistry, "draw", "image", lambda args: "image embed")
+        self._patch(image_cache.ImageRegistry, "reader", "image", lambda args: "image decode")
+        self._patch(Canvas, "save", "write", lambda args: "write PDF")
+        self._patch(Portfolio, "write_atomic", "write", lambda args: "write file")
+
+    def uninstall(self):
+        while self._patched:
+            owner, name, original = self._patched.pop()
+            setattr(owner, name, original)
+
+    # ---------- OUTPUT ----------
+    def trace(self):
+        # Chrome trace-event format: open in chrome://tracing or Perfetto
+        pid = os.getpid()
+        return {
+            "displayTimeUnit": "ms",
+            "traceEvents": [
+                {"name": name, "cat": category, "ph": "X", "pid": pid, "tid": 0,
+                 "ts": start / 1000, "dur": duration / 1000}
+                for name, category, start, duration, _ in self.events
+            ],
+        }
+
+    def write_trace(self, path):
+        with open(path, "w") as f:
+            json.dump(self.trace(), f)
+
+    def totals(self):
+        # {name: [calls, inclusive ns, self ns]}
+        totals = {}
+        for name, _, _, duration, own in self.events:
+            entry = totals.setdefault(name, [0, 0, 0])
+            entry[0] += 1
+            entry[1] += duration
+            entry[2] += own
+        return totals
+
+    def table(self):
+        totals = self.totals()
+        wall = sum(own for _, _, _, _, own in self.events) or 1
+        lines = [f"{'span':<32} {'calls':>7} {'total ms':>10} {'self ms':>10} {'self %':>7}"]
+        for name, (calls, total, own) in sorted(totals.items(), key=lambda item: -item[1][2]):
+            lines.append(f"{name:<32} {calls:>7} {total / 1e6:>10.2f} {own / 1e6:>10.2f} "
+                         f"{own / wall:>7.1%}")
+        return "\n".join(lines)
+
+
+@contextmanager
+def profile():
+    # with profile() as profiler: build_portfolio(...)
+    profiler = Profiler()
+    profiler.install()
+    try:
+        with profiler.span("build"):
+            yield profiler
+    finally:
+        profiler.uninstall()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the portfolio once with profiling hooks and report "
+                    "where the time went.")
+    parser.add_argument("--data", help="JSON file with the portfolio data "
+                        "(default: DEFAULT_DATA)")
+    parser.add_argument("-o", "--output", help="also write the PDF here")
+    parser.add_argument("--trace", default="portfolio_trace.json",
+                        help="Chrome trace-event JSON to write "
+                             "(default: portfolio_trace.json)")
+    parser.add_argument("--no-render-cache", action="store_true",
+                        help="draw every flowable instead of replaying recordings")
+    args = parser.parse_args()
+
+    data = Portfolio.load_data(args.data)
+    Portfolio.register_fonts()  # once per process, not part of a build
+    with profile() as profiler:
+        Portfolio.build_portfolio(data, args.output or io.BytesIO(),
+                                  render_cache=False if args.no_render_cache else None)
+    profiler.write_trace(args.trace)
+    print(profiler.table())
+    print(f"Trace written to {args.trace}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,271 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+from reportlab.lib.colors import Color
+
+from image_cache import CACHE_DIR
+
+RENDER_CACHE_DIR = os.path.join(CACHE_DIR, "render")
+# recordings kept on disk, by total size; the least recently used go first
+RENDER_CACHE_BYTES = 256 * 1024 * 1024
+# recordings also kept in memory, by the size of their JSON; they take a
+# few times that as Python objects. Least recently used go first.
+RENDER_MEMORY_BYTES = 32 * 1024 * 1024
+# eviction goes down to this share of the cap, so the next few writes
+# don't each have to scan the directory again
+EVICT_TO = 0.9
+
+# canvas calls that change the page and are recorded
+_CANVAS_OPS = {
+    "saveState", "restoreState", "translate", "scale",
+    "setFillColor", "setFillColorRGB", "setStrokeColor", "setFont",
+    "drawString", "drawCentredString", "linkURL",
+}
+# Shapes only append path operators that don't depend on the document, so
+# their output is kept as literal PDF code. Formatting those numbers is
+# most of what drawing a card costs. Text is replayed as calls because
+# TrueType subset encodings differ from one document to the next.
+_SHAPE_OPS = {"rect", "roundRect", "circle"}
+_TEXT_OPS = {"setFont", "setFillColor", "setLeading", "textLine"}
+_PATH_OPS = {"circle", "roundRect", "rect"}
+# calls that only read state, passed through without being recorded.
+# Anything that is neither recorded nor in here might change the page, so
+# a drawing that uses it is not cached (see RecordingCanvas.unrecorded).
+_QUERIES = {"stringWidth", "getX", "getY", "getCursor", "getPageNumber",
+            "_doctemplate", "_pagesize"}
+
+
+# ---------- SERIALIZING ----------
+def _encode(value):
+    if isinstance(value, Color):
+        return {"@color": [value.red, value.green, value.blue, value.alpha]}
+    if isinstance(value, (list, tuple)):
+        return [_encode(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _encode(v) for k, v in value.items()}
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        if "@color" in value:
+            return Color(*value["@color"])
+        return {k: _decode(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    return value
+
+
+def content_key(*parts):
+    # stable across processes: JSON of the inputs, not hash()
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=repr)
+    return hashlib.sha1(payload.encode("utf8")).hexdigest()
+
+
+# ---------- RECORDING ----------
+class _Recorder:
+    # forwards every call to the wrapped object and keeps a JSON-able list
+    # of the calls in ops_names. The first other attribute used (queries
+    # aside) is noted in owner.unrecorded: replaying would leave it out.
+    def __init__(self, target, ops_names, owner=None):
+        self._target = target
+        self._ops_names = ops_names
+        self._owner = owner or self
+        self.ops = []
+        self.unrecorded = None
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name in _QUERIES or name.startswith("__"):
+            return attr
+        if name not in self._ops_names:
+            if self._owner.unrecorded is None:
+                self._owner.unrecorded = f"{type(self._target).__name__}.{name}"
+            return attr
+
+        def call(*args, **kwargs):
+            self.ops.append([name, _encode(args), _encode(kwargs)])
+            return attr(*args, **kwargs)
+        return call
+
+
+class RecordingCanvas(_Recorder):
+    # Wraps a canvas while a flowable draws so the drawing can be replayed
+    # into later documents. Text objects and paths are recorded with their
+    # own calls; images are recorded by source path (see record_image)
+    # because XObject names only mean something inside one document.
+    def __init__(self, canv):
+        super().__init__(canv, _CANVAS_OPS)
+
+    def __getattr__(self, name):
+        if name not in _SHAPE_OPS:
+            return super().__getattr__(name)
+        attr = getattr(self._target, name)
+        code = self._target._code
+
+        def call(*args, **kwargs):
+            start = len(code)
+            attr(*args, **kwargs)
+            self.ops.append(["@code", code[start:], {}])
+        return call
+
+    @property
+    def canv(self):
+        return self._target
+
+    def beginText(self, *args):
+        text = _Recorder(self._target.beginText(*args), _TEXT_OPS, self)
+        text.origin = _encode(args)
+        return text
+
+    def drawText(self, text):
+        self.ops.append(["@text", text.origin, text.ops])
+        self._target.drawText(text._target)
+
+    def beginPath(self):
+        return _Recorder(self._target.beginPath(), _PATH_OPS, self)
+
+    def clipPath(self, path, **kwargs):
+        self.ops.append(["@clip", path.ops, _encode(kwargs)])
+        self._target.clipPath(path._target, **kwargs)
+
+    def record_image(self, *args):
+        self.ops.append(["@image", _encode(args), {}])
+
+
+# ---------- REPLAYING ----------
+def _replay_calls(target, ops):
+    for name, args, kwargs in ops:
+        getattr(target, name)(*_decode(args), **_decode(kwargs))
+
+
+def replay(canv, ops, draw_image):
+    for name, args, kwargs in ops:
+        if name == "@text":
+            text = canv.beginText(*args)
+            _replay_calls(text, kwargs)
+            canv.drawText(text)
+        elif name == "@clip":
+            path = canv.beginPath()
+            _replay_calls(path, args)
+            canv.clipPath(path, **_decode(kwargs))
+        elif name == "@code":
+            canv._code.extend(args)
+        elif name == "@image":
+            draw_image(canv, *_decode(args))
+        else:
+            getattr(canv, name)(*_decode(args), **_decode(kwargs))
+
+
+# ---------- CACHE ----------
+class RenderCache:
+    # Drawing of content-hashed flowables, kept in memory and as one JSON
+    # file per key on disk so a rebuild only re-runs the flowables whose
+    # inputs changed. The files are capped at max_bytes like OutputCache:
+    # reading one touches it, so mtime order is LRU order. The in-memory
+    # copies are an LRU capped at memory_bytes, and recordings evicted from
+    # disk leave memory too. uncacheable
+    # maps flowable types whose drawing couldn't be recorded to the call
+    # that stopped it.
+    def __init__(self, directory=RENDER_CACHE_DIR, max_bytes=RENDER_CACHE_BYTES,
+                 memory_bytes=RENDER_MEMORY_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self._entries = OrderedDict()  # key -> (entry, JSON size)
+        self._memory = 0
+        self._size = None  # bytes on disk, counted at the first write
+        self.hits = 0
+        self.misses = 0
+        self.uncacheable = {}
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def _remember(self, key, entry, size):
+        self._forget(key)
+        self._entries[key] = (entry, size)
+        self._memory += size
+        while self._memory > self.memory_bytes and len(self._entries) > 1:
+            _, (_, old) = self._entries.popitem(last=False)
+            self._memory -= old
+
+    def _forget(self, key):
+        dropped = self._entries.pop(key, None)
+        if dropped is not None:
+            self._memory -= dropped[1]
+
+    def get(self, key):
+        cached = self._entries.get(key)
+        if cached is not None:
+            self._entries.move_to_end(key)
+            entry = cached[0]
+        else:
+            path = self._path(key)
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                entry = json.loads(data)
+                os.utime(path)
+            except (OSError, ValueError):
+                self.misses += 1
+                return None
+            self._remember(key, entry, len(data))
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+            written = f.tell()
+        os.replace(tmp, path)
+        self._remember(key, entry, written)
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._files())
+        else:
+            self._size += written
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _files(self):
+        # (mtime ns, size, path) of every recording on disk
+        files = []
+        try:
+            shards = os.scandir(self.directory)
+        except FileNotFoundError:
+            return files
+        with shards:
+            for shard in shards:
+                if not shard.is_dir():
+                    continue
+                with os.scandir(shard.path) as entries:
+                    for e in entries:
+                        if e.name.endswith(".json"):
+                            st = e.stat()
+                            files.append((st.st_mtime_ns, st.st_size, e.path))
+        return files
+
+    def evict(self):
+        # drops the least recently used recordings, on disk and in memory,
+        # until the rest take EVICT_TO of max_bytes
+        files = self._files()
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes * EVICT_TO:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._forget(os.path.basename(path)[:-len(".json")])
+            total -= size
+        self._size = total
+
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
@@ -0,0 +1,437 @@
+import argparse
+import asyncio
+import http.client
+import io
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from reportlab.platypus.doctemplate import LayoutError
+
+import Portfolio
+
+# Serves portfolio PDFs over HTTP from warm worker processes: fonts are
+# registered once per worker, and the image and render caches fill up as
+# requests come in. Standard library only, so it runs anywhere the
+# generator does, offline included.
+#
+#   POST /render   portfolio JSON in, PDF out
+#   GET  /health   queue and cache counters as JSON
+
+HOST = "127.0.0.1"
+PORT = 8750
+# requests allowed to wait for a worker on top of the ones rendering;
+# past that the service answers 503 straight away
+QUEUE_SIZE = 16
+# rendered PDFs kept for repeated payloads, by total size
+CACHE_BYTES = 64 * 1024 * 1024
+MAX_BODY = 1024 * 1024
+CHUNK = 64 * 1024
+# a render that takes longer than this is reported as failed
+RENDER_TIMEOUT = 120
+# widest project/image grid a request may ask for
+MAX_COLUMNS = 4
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found",
+            405: "Method Not Allowed", 413: "Payload Too Large",
+            500: "Internal Server Error", 503: "Service Unavailable",
+            504: "Gateway Timeout"}
+
+
+# ---------- VALIDATION ----------
+class BadRequest(ValueError):
+    pass
+
+
+def _check(ok, where, expected):
+    if not ok:
+        raise BadRequest(f"{where}: expected {expected}")
+
+
+def _string(value, where):
+    _check(isinstance(value, str), where, "a string")
+
+
+def _number(value, where):
+    _check(isinstance(value, (int, float)) and not isinstance(value, bool)
+           and value > 0, where, "a positive number")
+
+
+def _strings(value, where):
+    _check(isinstance(value, (list, tuple)), where, "a list of strings")
+    for i, item in enumerate(value):
+        _string(item, f"{where}[{i}]")
+
+
+def _image(value, where):
+    _string(value, where)
+    try:
+        path = Portfolio.image_path(value)
+    except ValueError:
+        raise BadRequest(f"{where}: image {value!r} is outside the image folder") from None
+    _check(os.path.isfile(path), where, f"an image in the image folder, not {value!r}")
+
+
+def _pairs(value, where):
+    _check(isinstance(value, (list, tuple)), where, "a list of [label, url] pairs")
+    for i, pair in enumerate(value):
+        _check(isinstance(pair, (list, tuple)) and len(pair) == 2, f"{where}[{i}]", "[label, url]")
+        _strings(pair, f"{where}[{i}]")
+
+
+def _certificate(value, where):
+    # [title, subtitle, "#rrggbb"] with an optional link
+    _check(isinstance(value, (list, tuple)) and len(value) in (3, 4), where,
+           "[title, subtitle, colour] or [title, subtitle, colour, url]")
+    _strings(value, where)
+    color = value[2].lstrip("#")
+    _check(len(color) == 6 and all(c in "0123456789abcdefABCDEF" for c in color),
+           f"{where}[2]", "a #rrggbb colour")
+
+
+def _record(value, where, fields, required=()):
+    # a JSON object whose keys are all in fields (name -> check) and
+    # include the required ones; records become keyword arguments, so
+    # an unknown key would fail the render rather than being ignored
+    _check(isinstance(value, dict), where, "an object")
+    for name in required:
+        _check(name in value, where, f"a {name!r} key")
+    for name, item in value.items():
+        _check(name in fields, where, f"only keys {', '.join(fields)}, not {name!r}")
+        fields[name](item, f"{where}.{name}")
+
+
+def _list_of(check):
+    def check_list(value, where):
+        _check(isinstance(value, (list, tuple)), where, "a list")
+        for i, item in enumerate(value):
+            check(item, f"{where}[{i}]")
+    return check_list
+
+
+def _columns(value, where):
+    _check(isinstance(value, int) and not isinstance(value, bool)
+           and 1 <= value <= MAX_COLUMNS, where, f"a whole number from 1 to {MAX_COLUMNS}")
+
+
+def _boolean(value, where):
+    _check(isinstance(value, bool), where, "true or false")
+
+
+PROJECT = {"title": _string, "subtitle": _string, "description": _string,
+           "tags": _strings, "learned": _string, "icon": _string,
+           "width": _number, "height": _number, "padding": _number}
+IMAGE_CARD = {"image": _image, "caption": _string, "link": _string}
+PASSION = {"title": _string, "text": _string, "image": _image}
+CONTACT = {"email": _string, "location": _string, "links": _pairs,
+           "card_width": _number, "card_height": _number}
+GRID = {"columns": _columns, "masonry": _boolean}
+# every top-level key is optional: Portfolio.DEFAULT_DATA fills in the rest
+FIELDS = {
+    "name": _string, "short_name": _string, "tagline": _string,
+    "headline": _string, "overview": _string, "passion_footer": _string,
+    "copyright": _string, "profile_image": _image, "skills": _strings,
+    "certificates": _list_of(_list_of(_certificate)),
+    "projects": _list_of(lambda v, w: _record(
+        v, w, PROJECT, ("title", "subtitle", "description", "tags", "learned"))),
+    "image_cards": _list_of(lambda v, w: _record(v, w, IMAGE_CARD, ("image", "caption"))),
+    "passions": _list_of(lambda v, w: _record(v, w, PASSION, tuple(PASSION))),
+    "contact": lambda v, w: _record(v, w, CONTACT),
+    "grid": lambda v, w: _record(v, w, GRID),
+}
+
+
+def validate(data):
+    # raises BadRequest naming the first thing wrong with a payload, so
+    # bad input is the client's 400 and never reaches a worker
+    _record(data, "data", FIELDS)
+
+
+# ---------- WORKERS ----------
+def _render(data):
+    out = io.BytesIO()
+    Portfolio.build_portfolio(data, out)
+    return out.getvalue()
+
+
+class ResponseCache:
+    # LRU of rendered PDFs, bounded by their total size
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        pdf = self._entries.get(key)
+        if pdf is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return pdf
+
+    def put(self, key, pdf):
+        if len(pdf) > self.max_bytes or key in self._entries:
+            return
+        self._entries[key] = pdf
+        self.size += len(pdf)
+        while self.size > self.max_bytes:
+            _, old = self._entries.popitem(last=False)
+            self.size -= len(old)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RenderService:
+    # At most `workers` renders run at once and QUEUE_SIZE more wait;
+    # anything beyond is turned away rather than queued without bound.
+    # Identical payloads share one render while it is in flight and are
+    # answered from the cache after.
+    def __init__(self, workers=None, queue_size=QUEUE_SIZE, cache_bytes=CACHE_BYTES):
+        self.workers = workers or os.cpu_count()
+        self.queue_size = queue_size
+        self.cache = ResponseCache(cache_bytes)
+        self.pool = ProcessPoolExecutor(self.workers, initializer=Portfolio.register_fonts)
+        self.active = 0
+        # renders that timed out but are still running in a worker
+        self.overdue = 0
+        self.rejected = 0
+        self.rendered = 0
+        self.timed_out = 0
+        self._inflight = {}
+        self._slots = asyncio.Semaphore(self.workers)
+
+    def key(self, data):
+        # covers the images, fonts and styles too, so an edited image is
+        # never answered with a stale PDF
+        return Portfolio.build_key(data)
+
+    async def render(self, data):
+        # returns the PDF bytes, or None when the queue is full
+        key = self.key(data)
+        pdf = self.cache.get(key)
+        if pdf is not None:
+            return pdf
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        if self.active + self.overdue >= self.workers + self.queue_size:
+            self.rejected += 1
+            return None
+
+        self.active += 1
+        pending = self._inflight[key] = asyncio.ensure_future(self._run(key, data))
+        try:
+            return await asyncio.shield(pending)
+        finally:
+            self.active -= 1
+
+    async def _run(self, key, data):
+        try:
+            await self._slots.acquire()
+            job = asyncio.get_running_loop().run_in_executor(self.pool, _render, data)
+            # a worker can't be interrupted, so the slot is given back when
+            # the render really ends, not when the request stops waiting
+            job.add_done_callback(self._finished)
+            try:
+                pdf = await asyncio.wait_for(asyncio.shield(job), RENDER_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                self.overdue += 1
+                job.add_done_callback(self._overdue_finished)
+                raise
+            self.rendered += 1
+            self.cache.put(key, pdf)
+            return pdf
+        finally:
+            del self._inflight[key]
+
+    def _finished(self, job):
+        self._slots.release()
+        if not job.cancelled():
+            job.exception()  # retrieved, even when nobody awaits it any more
+
+    def _overdue_finished(self, job):
+        self.overdue -= 1
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "active": self.active,
+            "overdue": self.overdue,
+            "queue_size": self.queue_size,
+            "rendered": self.rendered,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "cache": {"entries": len(self.cache), "bytes": self.cache.size,
+                      "hits": self.cache.hits, "misses": self.cache.misses},
+        }
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+# ---------- HTTP ----------
+async def _read_request(reader):
+    # (method, path, headers, body) of one HTTP/1.1 request; body is None
+    # when it is larger than MAX_BODY
+    line = await reader.readline()
+    method, path, _ = line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length") or 0)
+    if length > MAX_BODY:
+        return method, path, headers, None
+    return method, path, headers, await reader.readexactly(length)
+
+
+async def _respond(writer, status, body, content_type="application/json", extra=()):
+    head = [f"HTTP/1.1 {status} {_REASONS[status]}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            "Connection: close"]
+    head.extend(f"{name}: {value}" for name, value in extra)
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+    # large PDFs go out in chunks so a slow client holds back only this
+    # connection, not the whole response in the transport buffer
+    for start in range(0, len(body), CHUNK):
+        writer.write(body[start:start + CHUNK])
+        await writer.drain()
+    await writer.drain()
+
+
+def _error(message):
+    return json.dumps({"error": message}).encode()
+
+
+async def handle(service, reader, writer):
+    try:
+        try:
+            method, path, headers, body = await _read_request(reader)
+        except (ValueError, asyncio.IncompleteReadError):
+            await _respond(writer, 400, _error("malformed request"))
+            return
+
+        path = path.split("?", 1)[0]
+        if path == "/health":
+            await _respond(writer, 200, json.dumps(service.stats()).encode())
+            return
+        if path != "/render":
+            await _respond(writer, 404, _error(f"no such endpoint {path}"))
+            return
+        if method != "POST":
+            await _respond(writer, 405, _error("use POST"), extra=[("Allow", "POST")])
+            return
+        if body is None:
+            await _respond(writer, 413, _error(f"body over {MAX_BODY} bytes"))
+            return
+        try:
+            data = json.loads(body or b"{}")
+        except ValueError as exc:
+            await _respond(writer, 400, _error(f"invalid JSON: {exc}"))
+            return
+        if not isinstance(data, dict):
+            await _respond(writer, 400, _error("expected a JSON object"))
+            return
+        try:
+            validate(data)
+        except BadRequest as exc:
+            await _respond(writer, 400, _error(str(exc)))
+            return
+
+        start = time.perf_counter()
+        try:
+            pdf = await service.render(data)
+        except asyncio.TimeoutError:
+            await _respond(writer, 504, _error(f"render took over {RENDER_TIMEOUT}s"))
+            return
+        except LayoutError as exc:
+            # valid data that doesn't fit the page, e.g. a paragraph
+            # taller than a frame
+            await _respond(writer, 400, _error(f"content doesn't fit: {' '.join(str(exc).split())}"))
+            return
+        except Exception as exc:
+            await _respond(writer, 500, _error(
+                f"{type(exc).__name__}: {' '.join(str(exc).split())}"))
+            return
+        if pdf is None:
+            await _respond(writer, 503, _error("render queue full"),
+                           extra=[("Retry-After", "1")])
+            return
+        await _respond(writer, 200, pdf, "application/pdf", [
+            ("X-Render-Seconds", f"{time.perf_counter() - start:.3f}")])
+    except ConnectionError:
+        pass  # the client went away
+    finally:
+        writer.close()
+
+
+async def serve(host=HOST, port=PORT, workers=None, queue_size=QUEUE_SIZE,
+                cache_bytes=CACHE_BYTES, ready=None):
+    # runs until cancelled; ready, if given, is called with the bound
+    # (host, port) once connections are accepted (port 0 picks a free one)
+    service = RenderService(workers, queue_size, cache_bytes)
+    try:
+        # one render up front so the first request doesn't pay for it
+        await asyncio.get_running_loop().run_in_executor(service.pool, _render, None)
+        server = await asyncio.start_server(
+            lambda r, w: handle(service, r, w), host, port)
+        async with server:
+            if ready:
+                ready(server.sockets[0].getsockname()[:2])
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+# ---------- CLIENT ----------
+def render_remote(data, host=HOST, port=PORT, timeout=RENDER_TIMEOUT):
+    # POSTs data to a running service; returns (status, headers, body)
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        conn.request("POST", "/render", json.dumps(data).encode(),
+                     {"Content-Type": "application/json"})
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve portfolio PDFs over HTTP from warm worker processes.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(),
+                        help="render processes (default: CPU count)")
+    parser.add_argument("--queue", type=int, default=QUEUE_SIZE,
+                        help=f"requests waiting for a worker before 503 (default {QUEUE_SIZE})")
+    parser.add_argument("--cache-mb", type=int, default=CACHE_BYTES >> 20,
+                        help=f"response cache size (default {CACHE_BYTES >> 20} MB)")
+    args = parser.parse_args()
+
+    def ready(address):
+        print(f"Serving on http://{address[0]}:{address[1]} "
+              f"({args.workers} workers, queue {args.queue})", flush=True)
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.queue,
+                          args.cache_mb << 20, ready))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,7 +10,20 @@
 #     print(f"Page {i+1}: {w:.0f} × {h:.0f} points")
 
 from pypdf import PdfReader, PdfWriter
+from pypdf.generic import (ArrayObject, DecodedStreamObject, FloatObject,
+                           NameObject, RectangleObject)
+import argparse
+import glob
+import hashlib
+import json
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from pdfstream import StreamingWriter, iter_pages, repack
+from profiles import DEFAULT_PROFILE, PROFILES, get_profile, writer_options
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 INPUT_PDF = os.path.join(BASE_DIR, "Homepage_case_study.pdf")
 OUTPUT_PDF = os.path.join(BASE_DIR, "Homepage_case_study_A4width.pdf")
@@ -18,22 +31,298 @@ OUTPUT_PDF = os.path.join(BASE_DIR, "Homepage_case_study_A4width.pdf")
 A4_WIDTH = 595
 A4_HEIGHT = 842
 
-reader = PdfReader(INPUT_PDF)
-writer = PdfWriter()
+OUTPUT_SUFFIX = "_A4width"
+# remembers the input hash behind every output so unchanged files are skipped
+MANIFEST_NAME = ".a4width-manifest.json"
+# workers are replaced after this many files so a huge PDF can't leave a
+# worker holding on to its memory for the rest of the run
+FILES_PER_WORKER = 20
+
+# "transform" prepends a cm operator to each page's untouched content
+# streams; "merge" is the old merge_scaled_page path, which parses and
+# rewrites every operator
+SCALE_MODES = ("transform", "merge")
+_PAGE_BOXES = ("/MediaBox", "/CropBox", "/BleedBox", "/TrimBox", "/ArtBox")
+# output profiles normalizing can use. draft only changes what the
+# generator does (no deflate, low-resolution images); a normalized PDF
+# would come out exactly as with standard, so it isn't offered here.
+TRIAL_PROFILES = [name for name in PROFILES if name != "draft"]
+# incremental mode lets go of the source objects it has parsed after
+# this many pages; everything they were needed for is on disk by then
+CHUNK_PAGES = 100
+
+
+# ---------- NORMALIZING ----------
+def _stream(writer, data):
+    stream = DecodedStreamObject()
+    stream.set_data(data)
+    if isinstance(writer, StreamingWriter):
+        return writer.add_object(stream)
+    return writer._add_object(stream)
+
+
+def _scale_points(points, scale, x0, y0):
+    # [x y x y ...] moved by -x0 -y0, then scaled
+    return [FloatObject(round((float(v) - (x0 if i % 2 == 0 else y0)) * scale, 6))
+            for i, v in enumerate(points)]
+
+
+def scale_page(writer, page, scale):
+    # Scales a page that already belongs to writer without touching its
+    # content: the original streams are kept as they are and wrapped in
+    # "q <scale> cm ... Q", and the page boxes and annotation rectangles
+    # are moved to the scaled coordinates. The origin is moved to 0 0 too.
+    x0 = float(page.mediabox.left)
+    y0 = float(page.mediabox.bottom)
+
+    contents = page.get("/Contents")
+    if contents is not None:
+        streams = contents.get_object()
+        refs = list(streams) if isinstance(streams, ArrayObject) else [contents]
+        prefix = b"q %s 0 0 %s %s %s cm\n" % tuple(
+            str(round(v, 6)).encode() for v in (scale, scale, -x0 * scale, -y0 * scale))
+        page[NameObject("/Contents")] = ArrayObject(
+            [_stream(writer, prefix)] + refs + [_stream(writer, b"\nQ\n")])
+
+    for box in _PAGE_BOXES:
+        if box in page:
+            page[NameObject(box)] = RectangleObject(
+                _scale_points(page[box], scale, x0, y0))
+
+    for annot in page.get("/Annots") or []:
+        annot = annot.get_object()
+        if "/Rect" in annot:
+            annot[NameObject("/Rect")] = RectangleObject(
+                _scale_points(annot["/Rect"], scale, x0, y0))
+        if "/QuadPoints" in annot:
+            annot[NameObject("/QuadPoints")] = ArrayObject(
+                _scale_points(annot["/QuadPoints"], scale, x0, y0))
+    return page
+
+
+def _normalize_incremental(input_pdf, output_pdf, options):
+    # Pages are scaled and written one at a time, so peak memory depends
+    # on the largest page rather than on the page count.
+    # The source is read from disk as needed instead of loaded whole.
+    tmp = f"{output_pdf}.{os.getpid()}.tmp"
+    pages = 0
+    with open(input_pdf, "rb") as src, open(tmp, "wb") as f:
+        reader = PdfReader(src)
+        writer = StreamingWriter(f, **options)
+        for pages, page in enumerate(iter_pages(reader), 1):
+            scale_page(writer, page, A4_WIDTH / float(page.mediabox.width))
+            writer.add_page(page)
+            if pages % CHUNK_PAGES == 0:
+                reader.resolved_objects.clear()
+        writer.close()
+    os.replace(tmp, output_pdf)
+    return pages
+
+
+def normalize_pdf(input_pdf, output_pdf, mode="transform", incremental=False,
+                  profile=DEFAULT_PROFILE):
+    # profile (see profiles.py) decides how the output is stored; images
+    # are copied as they are, whatever its resolution and quality
+    if profile not in TRIAL_PROFILES:
+        raise ValueError(f"profile {profile!r} doesn't apply to normalizing, "
+                         f"expected one of {', '.join(TRIAL_PROFILES)}")
+    options = writer_options(get_profile(profile))
+    if incremental:
+        if mode != "transform":
+            raise ValueError("incremental output needs the transform mode")
+        return _normalize_incremental(input_pdf, output_pdf, options)
+
+    reader = PdfReader(input_pdf)
+    writer = PdfWriter()
+
+    for page in reader.pages:
+        orig_w = float(page.mediabox.width)
+        orig_h = float(page.mediabox.height)
+
+        scale = A4_WIDTH / orig_w
+        new_h = orig_h * scale
+
+        if mode == "transform":
+            scale_page(writer, writer.add_page(page), scale)
+            continue
+
+        new_page = writer.add_blank_page(
+            width=A4_WIDTH,
+            height=new_h
+        )
+
+        new_page.merge_scaled_page(page, scale, scale)
+
+    tmp = f"{output_pdf}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        if any(options.values()):
+            out = BytesIO()
+            writer.write(out)
+            f.write(repack(out.getvalue(), **options))
+        else:
+            writer.write(f)
+    os.replace(tmp, output_pdf)
+    return len(reader.pages)
+
+
+# ---------- BATCH ----------
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def find_pdfs(inputs, missing=None):
+    # directories are searched recursively; anything else is a file or glob.
+    # Inputs that match nothing are appended to missing, when given.
+    found = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths = glob.glob(os.path.join(item, "**", "*.pdf"), recursive=True)
+        else:
+            paths = glob.glob(item, recursive=True)
+            if not paths and missing is not None:
+                missing.append(item)
+        found.extend(
+            os.path.abspath(p) for p in sorted(paths)
+            if not os.path.splitext(p)[0].endswith(OUTPUT_SUFFIX))
+    return list(dict.fromkeys(found))
+
+
+def output_path(input_pdf, out_dir):
+    stem = os.path.splitext(os.path.basename(input_pdf))[0]
+    return os.path.join(out_dir or os.path.dirname(input_pdf),
+                        stem + OUTPUT_SUFFIX + ".pdf")
+
+
+def _normalize_job(job):
+    input_pdf, output_pdf, previous_hash, mode, incremental, profile = job
+    start = time.perf_counter()
+    result = {
+        "input": input_pdf,
+        "output": output_pdf,
+        "bytes": os.path.getsize(input_pdf),
+        "pages": 0,
+        "skipped": False,
+        "error": None,
+    }
+    try:
+        # the mode and profile are part of the hash so switching rebuilds
+        result["hash"] = f"{file_hash(input_pdf)}-{mode}-{profile}"
+        if result["hash"] == previous_hash and os.path.exists(output_pdf):
+            result["skipped"] = True
+        else:
+            result["pages"] = normalize_pdf(input_pdf, output_pdf, mode, incremental,
+                                            profile)
+    except Exception as exc:
+        result["error"] = f"{type(exc).__name__}: {exc}"
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def _load_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(path, manifest):
+    # swapped in whole, so an interrupted run leaves the old manifest
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def normalize_batch(inputs, out_dir=None, workers=None, mode="transform",
+                    incremental=None, profile=DEFAULT_PROFILE):
+    # incremental=None streams every output (bounded memory per worker)
+    # whenever the mode allows it, i.e. in transform mode
+    if incremental is None:
+        incremental = mode == "transform"
+    missing = []
+    pdfs = find_pdfs(inputs, missing)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    # one manifest per output directory
+    manifests = {}
+    jobs = []
+    for pdf in pdfs:
+        dst = output_path(pdf, out_dir)
+        manifest_path = os.path.join(os.path.dirname(dst), MANIFEST_NAME)
+        if manifest_path not in manifests:
+            manifests[manifest_path] = _load_manifest(manifest_path)
+        jobs.append((pdf, dst, manifests[manifest_path].get(pdf), mode, incremental,
+                     profile))
+
+    with ProcessPoolExecutor(max_workers=workers,
+                             max_tasks_per_child=FILES_PER_WORKER) as pool:
+        results = list(pool.map(_normalize_job, jobs))
+    # inputs that matched nothing are reported as failures, not dropped
+    results.extend({"input": item, "output": None, "bytes": 0, "pages": 0,
+                    "skipped": False, "error": "no such file, directory or matching PDF",
+                    "seconds": 0.0} for item in missing)
+
+    for result in results:
+        if result["error"] is None:
+            manifest_path = os.path.join(os.path.dirname(result["output"]), MANIFEST_NAME)
+            manifests[manifest_path][result["input"]] = result["hash"]
+    for manifest_path, manifest in manifests.items():
+        _write_manifest(manifest_path, manifest)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Scale PDFs to A4 width, keeping each page's aspect ratio.")
+    parser.add_argument("inputs", nargs="*",
+                        help="PDF files, directories or globs (default: Homepage_case_study.pdf)")
+    parser.add_argument("-o", "--out", help="output directory (default: next to each input)")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(),
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--mode", choices=SCALE_MODES, default="transform",
+                        help="transform keeps page content as is (default); "
+                             "merge rewrites it with merge_scaled_page")
+    parser.add_argument("--incremental", action=argparse.BooleanOptionalAction,
+                        help="write pages as they are scaled so memory stays flat "
+                             "for huge inputs (transform mode only; the default "
+                             "for batch runs in transform mode)")
+    parser.add_argument("--profile", choices=TRIAL_PROFILES, default=DEFAULT_PROFILE,
+                        help="output profile: web packs objects into object streams, "
+                             f"web and print drop ASCII85 encoding (default {DEFAULT_PROFILE})")
+    args = parser.parse_args()
+    if args.incremental and args.mode != "transform":
+        parser.error("--incremental needs --mode transform")
+
+    if not args.inputs:
+        normalize_pdf(INPUT_PDF, OUTPUT_PDF, args.mode, bool(args.incremental), args.profile)
+        return 0
 
-for page in reader.pages:
-    orig_w = float(page.mediabox.width)
-    orig_h = float(page.mediabox.height)
+    start = time.perf_counter()
+    results = normalize_batch(args.inputs, args.out, args.workers, args.mode,
+                              args.incremental, args.profile)
+    elapsed = time.perf_counter() - start
 
-    scale = A4_WIDTH / orig_w
-    new_h = orig_h * scale
+    done = [r for r in results if not r["skipped"] and r["error"] is None]
+    skipped = [r for r in results if r["skipped"]]
+    failed = [r for r in results if r["error"]]
+    for r in failed:
+        print(f"FAILED {r['input']}: {r['error']}")
 
-    new_page = writer.add_blank_page(
-        width=A4_WIDTH,
-        height=new_h
+    pages = sum(r["pages"] for r in done)
+    megabytes = sum(r["bytes"] for r in done) / (1024 * 1024)
+    print(
+        f"{len(done)} normalized, {len(skipped)} unchanged, {len(failed)} failed "
+        f"in {elapsed:.2f}s: {pages} pages ({pages / elapsed:.1f} pages/s), "
+        f"{megabytes:.1f} MB ({megabytes / elapsed:.2f} MB/s)"
     )
+    return 1 if failed else 0
 
-    new_page.merge_scaled_page(page, scale, scale)
 
-with open(OUTPUT_PDF, "wb") as f:
-    writer.write(f)
+if __name__ == "__main__":
+    raise SystemExit(main())
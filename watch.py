@@ -0,0 +1,55 @@
+import os
+import time
+
+# Polling rather than inotify: works the same on every platform and needs
+# nothing beyond the standard library. A handful of directories is cheap
+# to stat a few times a second.
+POLL_INTERVAL = 0.2
+DEBOUNCE = 0.3
+
+
+def snapshot(paths):
+    # (size, mtime) of every file named in paths or directly inside a
+    # directory in paths; missing paths are simply absent
+    state = {}
+    for path in paths:
+        if os.path.isdir(path):
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_file() and not entry.name.startswith("."):
+                        st = entry.stat()
+                        state[entry.path] = (st.st_size, st.st_mtime_ns)
+        elif os.path.exists(path):
+            st = os.stat(path)
+            state[path] = (st.st_size, st.st_mtime_ns)
+    return state
+
+
+def _diff(old, new):
+    return {p for p in old.keys() | new.keys() if old.get(p) != new.get(p)}
+
+
+def watch_changes(paths, interval=POLL_INTERVAL, debounce=DEBOUNCE):
+    # Yields the set of changed files each time paths settle after a change.
+    # A burst (an editor's save dance, copying a folder of images) is
+    # collected until nothing has changed for `debounce` seconds.
+    state = snapshot(paths)
+    while True:
+        time.sleep(interval)
+        current = snapshot(paths)
+        changed = _diff(state, current)
+        if not changed:
+            continue
+
+        quiet_since = time.monotonic()
+        while time.monotonic() - quiet_since < debounce:
+            time.sleep(interval)
+            latest = snapshot(paths)
+            more = _diff(current, latest)
+            if more:
+                changed |= more
+                current = latest
+                quiet_since = time.monotonic()
+
+        state = current
+        yield changed